@@ -0,0 +1,27 @@
+"""Helpers shared by the benchmark scripts in this directory."""
+import asyncio
+import time
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def create_posts(http, headers, count, clients):
+    # Creates `count` posts over `clients` concurrent workers; returns the
+    # per-request latencies in milliseconds and the wall time in seconds
+    samples, next_post = [], iter(range(count))
+
+    async def worker():
+        for i in next_post:
+            start = time.perf_counter()
+            response = await http.post("/posts", json={"title": f"Post {i}", "content": "x" * 500,
+                                                       "category": f"category-{i % 8}"}, headers=headers)
+            response.raise_for_status()
+            samples.append((time.perf_counter() - start) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    return samples, time.perf_counter() - started
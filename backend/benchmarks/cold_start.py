@@ -0,0 +1,92 @@
+"""Cold start: import-time profile and time until a fresh worker is ready.
+
+Imports the app module in a fresh interpreter with -X importtime and lists
+the slowest of its direct imports (cumulative), then starts uvicorn
+on it several times and measures how long each process takes, from spawn,
+to answer GET /readyz with 200. Exits non-zero if the median is over the
+target. main.py needs MongoDB on MONGODB_URL to become ready.
+
+    cd backend
+    python benchmarks/cold_start.py --app main_test --runs 5 --target-ms 1200
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def import_profile(module):
+    # [(cumulative ms, module)] for each import, from -X importtime's stderr
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=BACKEND, capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative) / 1000, name.rstrip()))
+    return rows
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_ready(module, timeout):
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", f"{module}:app", "--port", str(port),
+                                "--log-level", "warning"], cwd=BACKEND)
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/readyz", timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except (urllib.error.URLError, ConnectionError):
+                pass
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with {process.returncode}")
+            time.sleep(0.01)
+        raise RuntimeError(f"not ready after {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", default="main_test", help="module holding `app`")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--target-ms", type=float, default=1200.0, help="median time-to-ready budget")
+    args = parser.parse_args()
+
+    rows = import_profile(args.app)
+    total = next(cumulative for cumulative, name in reversed(rows) if name.strip() == args.app)
+    print(f"import {args.app}: {total:.0f}ms; slowest direct imports:")
+    # importtime indents each level by two more spaces; the app's own imports are at depth one
+    direct = [(cumulative, name.strip()) for cumulative, name in rows
+              if name.startswith("   ") and not name.startswith("     ")]
+    for cumulative, name in sorted(direct, reverse=True)[:args.top]:
+        print(f"  {cumulative:8.1f}ms  {name}")
+
+    samples = [time_to_ready(args.app, args.timeout) for _ in range(args.runs)]
+    median = statistics.median(samples)
+    print(f"time to ready: median={median:.0f}ms min={min(samples):.0f}ms max={max(samples):.0f}ms "
+          f"(target {args.target_ms:.0f}ms)")
+    sys.exit(0 if median <= args.target_ms else 1)
+
+
+if __name__ == "__main__":
+    main()
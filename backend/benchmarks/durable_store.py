@@ -0,0 +1,78 @@
+"""Write throughput of the durable in-memory store, and its replay time.
+
+Creates posts through the ASGI app in main_test.py with a number of
+concurrent clients, once with STORAGE_MODE=memory and once with
+STORAGE_MODE=durable in a scratch directory, and prints posts per second
+and latency percentiles for each along with the fsyncs the durable run
+needed. Then reopens the durable store, as a restart would, and times
+replaying the log. With --snapshot the store is closed first, so the
+replay reads one compact snapshot instead of the log.
+
+    cd backend
+    python benchmarks/durable_store.py --clients 64 --posts 5000
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# Every request comes from the same user; the write limit would cap the run
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import httpx
+
+import main_test
+from common import password_context
+from _util import create_posts, percentile
+
+
+async def run_mode(store, args):
+    main_test.store = store
+    transport = httpx.ASGITransport(app=main_test.app)
+    async with main_test.app.router.lifespan_context(main_test.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            response = await http.post("/auth/signup", json={
+                "username": "writer", "email": "writer@example.com", "password": "secret"})
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+            samples, elapsed = await create_posts(http, headers, args.posts, args.clients)
+            if not args.snapshot and isinstance(store, main_test.DurableStore):
+                # Leave the log as a crash would, without the snapshot close() writes
+                await store.log.sync()
+                store.log.records_since_snapshot = 0
+    line = (f"{'durable' if isinstance(store, main_test.DurableStore) else 'memory':<8} "
+            f"posts/s={len(samples) / elapsed:,.0f} p50={statistics.median(samples):.2f}ms "
+            f"p99={percentile(samples, 99):.2f}ms")
+    if isinstance(store, main_test.DurableStore):
+        line += f" fsyncs={store.log.fsyncs}"
+    print(line)
+
+
+async def run(args):
+    password_context().update(bcrypt__rounds=4)
+    directory = tempfile.mkdtemp(prefix="durable_store_")
+    try:
+        print(f"clients={args.clients} posts={args.posts} fsync interval={main_test.WAL_FSYNC_INTERVAL_MS}ms")
+        await run_mode(main_test.MemoryStore(), args)
+        await run_mode(main_test.DurableStore(directory), args)
+
+        store = main_test.DurableStore(directory)
+        started = time.perf_counter()
+        records = await asyncio.to_thread(store.replay)
+        source = "snapshot" if args.snapshot else "log"
+        print(f"replay   {records:,} records from the {source} in {(time.perf_counter() - started) * 1000:.0f}ms, "
+              f"{len(store.posts):,} posts")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--snapshot", action="store_true", help="replay from the snapshot written on close")
+    asyncio.run(run(parser.parse_args()))
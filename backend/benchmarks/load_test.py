@@ -0,0 +1,267 @@
+"""Mixed-traffic load test with per-route latency and a baseline check.
+
+Drives the ASGI app in process with a number of concurrent clients, each
+signing up once and then picking requests at random from a weighted mix of
+signup, login, list, get, create, update and delete. Prints a JSON report
+with throughput, errors and p50/p95/p99 latency per route. With --baseline,
+routes whose p95 rose or whose throughput fell by more than --tolerance
+against the stored report are listed and the exit status is non-zero.
+
+Backends: "memory" is main_test.py; "mongo" is main.py against MONGODB_URL
+(a scratch database, dropped afterwards); "mongomock" is main.py against
+an in-process stand-in (pip install mongomock-motor), which exercises the
+app code but not real database latency.
+
+bcrypt at its default cost takes a few hundred milliseconds of CPU per
+signup or login, so on a small machine the auth routes saturate the hash
+pool long before anything else; --bcrypt-rounds lowers the cost to look at
+the other routes.
+
+    cd backend
+    pip install httpx
+    python benchmarks/load_test.py --bcrypt-rounds 4 --output report.json
+    python benchmarks/load_test.py --bcrypt-rounds 4 --baseline benchmarks/baselines/memory.json
+
+Numbers depend on the machine; record a baseline on the machine that checks it.
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# Many clients share one address; the limits would turn the run into 429s
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import httpx
+
+from common import password_context
+from _util import percentile
+
+DEFAULT_MIX = "list=48,get=28,create=10,update=7,delete=4,login=2,signup=1"
+ROUTES = {
+    "signup": "POST /auth/signup",
+    "login": "POST /auth/login",
+    "list": "GET /posts",
+    "get": "GET /posts/{post_id}",
+    "create": "POST /posts",
+    "update": "PUT /posts/{post_id}",
+    "delete": "DELETE /posts/{post_id}",
+}
+CATEGORIES = ("general", "technology", "science", "language", "culture")
+PASSWORD = "load-test-password"
+
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ROUTES:
+            raise SystemExit(f"Unknown operation in --mix: {name!r}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def post_id_of(body):
+    # main_test.py returns "id", main.py "_id"
+    return body.get("id") or body.get("_id")
+
+
+def load_app(backend):
+    # Returns the app and the module, with the database pointed at a scratch
+    # database for the Mongo backends
+    if backend == "memory":
+        module = importlib.import_module("main_test")
+        return module.app, module
+    module = importlib.import_module("main")
+    module.DATABASE_NAME = f"{module.DATABASE_NAME}_load_test"
+    if backend == "mongomock":
+        from mongomock_motor import AsyncMongoMockClient
+
+        def connect_database():
+            module.client = AsyncMongoMockClient()
+            module.database = module.client[module.DATABASE_NAME]
+            module.users_collection = module.database.users
+            module.posts_collection = module.database.posts
+            module.categories_collection = module.database.categories
+
+        async def prewarm_pool():
+            pass
+
+        module.connect_database = connect_database
+        module.prewarm_pool = prewarm_pool
+    return module.app, module
+
+
+class Client:
+    def __init__(self, number, http, rng, mix, shared_posts):
+        self.number = number
+        self.http = http
+        self.rng = rng
+        self.operations = list(mix)
+        self.weights = list(mix.values())
+        self.shared_posts = shared_posts
+        self.own_posts = []
+        self.signups = 0
+        self.username = None
+        self.headers = {}
+
+    async def signup(self):
+        # A new account each time; the client keeps acting as the first one
+        self.signups += 1
+        username = f"load{self.number}x{self.signups}x{self.rng.randrange(1 << 30)}"
+        response = await self.http.post("/auth/signup", json={
+            "username": username, "email": f"{username}@example.com", "password": PASSWORD})
+        if response.status_code == 200 and self.username is None:
+            self.username = username
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        return response
+
+    async def request(self, operation):
+        # Falls back to a create when there is nothing of its own to change
+        if operation in ("update", "delete") and not self.own_posts:
+            operation = "create"
+        if operation == "get" and not self.shared_posts:
+            operation = "list"
+        if operation == "signup":
+            return operation, await self.signup()
+        if operation == "login":
+            return operation, await self.http.post("/auth/login", json={"username": self.username, "password": PASSWORD})
+        if operation == "list":
+            return operation, await self.http.get("/posts", params={"limit": 10})
+        if operation == "get":
+            return operation, await self.http.get(f"/posts/{self.rng.choice(self.shared_posts)}")
+        if operation == "create":
+            response = await self.http.post("/posts", headers=self.headers, json={
+                "title": f"Load test post {self.rng.randrange(1 << 20)}",
+                "content": "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * self.rng.randint(1, 12),
+                "category": self.rng.choice(CATEGORIES),
+            })
+            if response.status_code == 200:
+                post_id = post_id_of(response.json())
+                self.own_posts.append(post_id)
+                self.shared_posts.append(post_id)
+            return operation, response
+        if operation == "update":
+            post_id = self.rng.choice(self.own_posts)
+            return operation, await self.http.put(f"/posts/{post_id}", headers=self.headers, json={
+                "title": f"Updated {self.rng.randrange(1 << 20)}"})
+        post_id = self.own_posts.pop(self.rng.randrange(len(self.own_posts)))
+        response = await self.http.delete(f"/posts/{post_id}", headers=self.headers)
+        if post_id in self.shared_posts:
+            self.shared_posts.remove(post_id)
+        return operation, response
+
+    async def run(self, deadline, samples, errors):
+        while time.perf_counter() < deadline:
+            operation = self.rng.choices(self.operations, self.weights)[0]
+            start = time.perf_counter()
+            operation, response = await self.request(operation)
+            samples[operation].append((time.perf_counter() - start) * 1000)
+            # A get can race another client's delete of the same post
+            if response.status_code >= 400 and not (operation == "get" and response.status_code == 404):
+                errors[operation] += 1
+
+
+def build_report(args, samples, errors, elapsed):
+    routes = {}
+    for operation, route in ROUTES.items():
+        latencies = samples[operation]
+        if not latencies:
+            continue
+        routes[route] = {
+            "requests": len(latencies),
+            "errors": errors[operation],
+            "throughput_rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+        }
+    total = sum(len(latencies) for latencies in samples.values())
+    return {
+        "config": {"backend": args.backend, "clients": args.clients, "duration_s": args.duration,
+                   "mix": args.mix, "seed": args.seed, "bcrypt_rounds": args.bcrypt_rounds},
+        "total": {"requests": total, "errors": sum(errors.values()), "throughput_rps": round(total / elapsed, 1)},
+        "routes": routes,
+    }
+
+
+def compare(report, baseline, tolerance):
+    # Regressions as readable lines; routes missing from either side are skipped
+    regressions = []
+    for route, current in report["routes"].items():
+        previous = baseline.get("routes", {}).get(route)
+        if previous is None:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{route}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{route}: throughput {previous['throughput_rps']}/s -> {current['throughput_rps']}/s")
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{route}: errors {previous['errors']} -> {current['errors']}")
+    return regressions
+
+
+async def run(args):
+    app, module = load_app(args.backend)
+    if args.bcrypt_rounds:
+        password_context().update(bcrypt__rounds=args.bcrypt_rounds)
+    mix = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+    samples = {operation: [] for operation in ROUTES}
+    errors = {operation: 0 for operation in ROUTES}
+    shared_posts = []
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+            clients = [Client(number, http, random.Random(rng.random()), mix, shared_posts)
+                       for number in range(args.clients)]
+            # Accounts and a few posts per client exist before timing starts
+            await asyncio.gather(*(client.signup() for client in clients))
+            for _ in range(3):
+                await asyncio.gather(*(client.request("create") for client in clients))
+            started = time.perf_counter()
+            await asyncio.gather(*(client.run(started + args.duration, samples, errors) for client in clients))
+            elapsed = time.perf_counter() - started
+        if args.backend == "mongo":
+            await module.client.drop_database(module.DATABASE_NAME)
+    return build_report(args, samples, errors, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=("memory", "mongo", "mongomock"), default="memory")
+    parser.add_argument("--clients", type=int, default=32, help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of timed traffic")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="operation=weight pairs")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--bcrypt-rounds", type=int, help="override the password hash cost (4-31)")
+    parser.add_argument("--output", help="also write the report to this file (e.g. to store a baseline)")
+    parser.add_argument("--baseline", help="report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p95 rise / throughput drop")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+            output.write("\n")
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get("config") != report["config"]:
+            print(f"Note: baseline was recorded with {baseline.get('config')}", file=sys.stderr)
+        regressions = compare(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Read latency under a login storm, against the in-memory backend.
+
+Runs a steady stream of GET /posts requests while a number of clients hammer
+POST /auth/login, and prints read p50/p99 for a quiet baseline and for the
+storm. With bcrypt in the worker pool the two should be close; pass
+--inline to hash on the event loop (the old behaviour) for comparison.
+
+    cd backend
+    pip install httpx
+    python benchmarks/login_storm.py --logins 16 --duration 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# The storm is the point; don't let the login rate limit absorb it
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import httpx
+
+import main_test
+from _util import percentile
+
+
+async def reader(client, stop, samples, interval=0.005):
+    # Reads are scheduled every `interval` seconds and timed from their scheduled
+    # start, so time spent waiting on a blocked event loop counts as latency
+    scheduled = time.perf_counter()
+    while not stop.is_set():
+        response = await client.get("/posts", params={"limit": 10})
+        samples.append((time.perf_counter() - scheduled) * 1000)
+        assert response.status_code == 200
+        scheduled += interval
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+
+
+async def login_loop(client, stop, counts):
+    while not stop.is_set():
+        response = await client.post("/auth/login", json={"username": "demo", "password": "demo123"})
+        counts[response.status_code] = counts.get(response.status_code, 0) + 1
+        # In --inline mode nothing in the request path suspends, so yield explicitly
+        await asyncio.sleep(0)
+
+
+async def measure(client, duration, logins):
+    stop = asyncio.Event()
+    samples, counts = [], {}
+    tasks = [asyncio.create_task(reader(client, stop, samples))]
+    tasks += [asyncio.create_task(login_loop(client, stop, counts)) for _ in range(logins)]
+    await asyncio.sleep(duration)
+    stop.set()
+    await asyncio.gather(*tasks)
+    return samples, counts
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=16, help="concurrent login clients")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per phase")
+    parser.add_argument("--inline", action="store_true", help="hash on the event loop instead of the pool")
+    args = parser.parse_args()
+
+    if args.inline:
+        async def run_inline(func, *func_args):
+            return func(*func_args)
+        main_test.password_pool.run = run_inline
+
+    # The demo user is seeded by the app's startup
+    async with main_test.app.router.lifespan_context(main_test.app):
+        transport = httpx.ASGITransport(app=main_test.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for phase, logins in (("baseline", 0), ("login storm", args.logins)):
+                samples, counts = await measure(client, args.duration, logins)
+                print(
+                    f"{phase:<12} reads={len(samples):<6} "
+                    f"p50={statistics.median(samples):7.2f}ms p99={percentile(samples, 99):7.2f}ms "
+                    f"logins={counts}"
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
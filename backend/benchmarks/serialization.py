@@ -0,0 +1,89 @@
+"""Per-post cost of turning Mongo documents into a JSON list response.
+
+"before" replays the old path: build a Post model per document, let
+FastAPI re-validate the list against response_model=List[Post], dump it in
+JSON mode and render it with the stdlib json module. "after" is the current
+path: post_to_dict per document and a single orjson.dumps.
+
+    cd backend
+    python benchmarks/serialization.py
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import orjson
+from bson import ObjectId
+from pydantic import TypeAdapter
+
+from main import Post, post_to_dict
+
+posts_adapter = TypeAdapter(List[Post])
+
+
+def make_docs(count):
+    author_id = ObjectId()
+    start = datetime(2024, 1, 1)
+    return [{
+        "_id": ObjectId(),
+        "title": f"Post number {i}",
+        "content": "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 8,
+        "category": "general",
+        "author_id": author_id,
+        "author_username": "demo",
+        "created_at": start + timedelta(minutes=i),
+        "updated_at": start + timedelta(minutes=i),
+    } for i in range(count)]
+
+
+def before(docs):
+    posts = [Post(
+        _id=str(post["_id"]),
+        title=post["title"],
+        content=post["content"],
+        category=post["category"],
+        author_id=str(post["author_id"]),
+        author_username=post["author_username"],
+        created_at=post["created_at"],
+        updated_at=post["updated_at"]
+    ) for post in docs]
+    validated = posts_adapter.validate_python(posts)
+    content = posts_adapter.dump_python(validated, mode="json", by_alias=True)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def after(docs):
+    return orjson.dumps([post_to_dict(post) for post in docs])
+
+
+def per_post_us(func, docs, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(docs)
+    return (time.perf_counter() - start) / repeat / len(docs) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'posts':>6} {'before':>12} {'after':>12} {'speedup':>8}   (microseconds per post)")
+    for size in args.sizes:
+        docs = make_docs(size)
+        assert json.loads(before(docs)) == json.loads(after(docs))
+        repeat = max(1, args.repeat * 10 // size)
+        old = per_post_us(before, docs, repeat)
+        new = per_post_us(after, docs, repeat)
+        print(f"{size:>6} {old:>12.2f} {new:>12.2f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
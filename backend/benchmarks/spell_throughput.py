@@ -0,0 +1,90 @@
+"""GET /spell lookup throughput at edit distances 1 and 2.
+
+Generates a synthetic word list, compiles it with spell.build_index, opens
+the file memory-mapped the way the app does and runs misspelled queries
+(words with one or two random edits, plus some unrelated strings) through
+spell() at max_distance 1 and 2, reporting lookups per second and latency.
+
+    cd backend
+    python benchmarks/spell_throughput.py --words 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from spell import SpellIndex, TermSpellIndex, build_index, spell
+from _util import percentile
+
+
+def make_words(count, rng):
+    words = {}
+    while len(words) < count:
+        word = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 12)))
+        words[word] = int(1_000_000 / (len(words) + 1)) + 1
+    return words
+
+
+def misspell(word, edits, rng):
+    for _ in range(edits):
+        i = rng.randrange(len(word))
+        operation = rng.choice(("delete", "insert", "replace", "swap"))
+        if operation == "delete" and len(word) > 1:
+            word = word[:i] + word[i + 1:]
+        elif operation == "insert":
+            word = word[:i] + rng.choice(string.ascii_lowercase) + word[i:]
+        elif operation == "swap" and i + 1 < len(word):
+            word = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+        else:
+            word = word[:i] + rng.choice(string.ascii_lowercase) + word[i + 1:]
+    return word
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=5_000)
+    parser.add_argument("--limit", type=int, default=5)
+    args = parser.parse_args()
+    rng = random.Random(7)
+
+    words = make_words(args.words, rng)
+    start = time.perf_counter()
+    index_bytes = build_index(words)
+    build_s = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "words.spell")
+        with open(path, "wb") as index_file:
+            index_file.write(index_bytes)
+        start = time.perf_counter()
+        index = SpellIndex.open(path)
+        open_ms = (time.perf_counter() - start) * 1000
+        terms = TermSpellIndex(0, index)
+        print(f"words={len(words)} index={len(index_bytes) / 1e6:.1f}MB build={build_s:.1f}s open={open_ms:.2f}ms")
+
+        vocabulary = list(words)
+        for max_distance in (1, 2):
+            queries = [misspell(rng.choice(vocabulary), rng.randint(1, max_distance), rng) for _ in range(args.queries)]
+            queries[::10] = ["".join(rng.choices(string.ascii_lowercase, k=8)) for _ in queries[::10]]
+            samples, found = [], 0
+            started = time.perf_counter()
+            for query in queries:
+                start = time.perf_counter()
+                found += bool(spell(query, max_distance, args.limit, index, terms))
+                samples.append((time.perf_counter() - start) * 1000)
+            elapsed = time.perf_counter() - started
+            print(f"distance={max_distance} lookups/s={len(queries) / elapsed:,.0f} "
+                  f"p50={statistics.median(samples):.3f}ms p99={percentile(samples, 99):.3f}ms "
+                  f"with suggestions={found / len(queries):.0%}")
+        del index, terms
+
+
+if __name__ == "__main__":
+    main()
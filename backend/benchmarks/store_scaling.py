@@ -0,0 +1,79 @@
+"""Per-operation latency of the in-memory MemoryStore as the post count grows.
+
+Fills a fresh store with N posts for each size and times the lookups the
+routes make: first and deep listing pages (skip and cursor), per-author
+and per-category pages, get by id and email lookup. With the store's
+indexes every column should stay roughly flat from 1k to 1M.
+
+    cd backend
+    python benchmarks/store_scaling.py --sizes 1000 10000 100000 1000000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from main_test import MemoryStore
+
+AUTHORS = 100
+CATEGORIES = ("general", "technology", "science", "language", "culture")
+WORDS = ("lexicon", "grammar", "syntax", "etymology", "phonetics", "semantics", "idiom", "dialect")
+
+
+def build_store(size):
+    store = MemoryStore()
+    for i in range(AUTHORS):
+        store.insert_user({"_id": f"user-{i}", "username": f"user{i}", "email": f"user{i}@example.com",
+                           "password": "", "created_at": datetime.utcnow()})
+    start = datetime(2024, 1, 1)
+    for i in range(size):
+        store.insert_post({
+            "_id": f"post-{i:08d}",
+            "title": f"{WORDS[i % len(WORDS)]} note {i}",
+            "content": f"{WORDS[(i * 3) % len(WORDS)]} {WORDS[(i * 5) % len(WORDS)]}",
+            "category": CATEGORIES[i % len(CATEGORIES)],
+            "author_id": f"user-{i % AUTHORS}",
+            "author_username": f"user{i % AUTHORS}",
+            "created_at": start + timedelta(seconds=i),
+            "updated_at": start + timedelta(seconds=i),
+        })
+    return store
+
+
+def time_op(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    columns = ("page 1", "deep skip", "deep cursor", "by author", "by category", "get", "email")
+    print(f"{'posts':>9} " + " ".join(f"{c:>12}" for c in columns) + "   (microseconds per op)")
+    for size in args.sizes:
+        store = build_store(size)
+        middle = store.posts[f"post-{size // 2:08d}"]
+        after = (middle["created_at"], middle["_id"])
+        ops = (
+            lambda: store.list_posts(limit=10),
+            lambda: store.list_posts(skip=size // 2, limit=10),
+            lambda: store.list_posts(after=after, limit=10),
+            lambda: store.list_posts(author_id="user-7", limit=10),
+            lambda: store.list_posts(category="science", limit=10),
+            lambda: store.get_post(middle["_id"]),
+            lambda: store.get_user_by_email("user42@example.com"),
+        )
+        timings = [time_op(op, args.repeat) for op in ops]
+        print(f"{size:>9} " + " ".join(f"{t:>12.1f}" for t in timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""GET /suggest lookup latency over a large word list.
+
+Generates a synthetic word list with Zipf-like frequencies, compiles it
+with suggest.build_index, opens the file memory-mapped the way the app does
+and times suggest() for random 1-4 character prefixes of real words, with a
+set of post titles indexed alongside. Exits non-zero if p99 is over the
+target.
+
+    cd backend
+    python benchmarks/suggest_latency.py --words 500000
+"""
+import argparse
+import os
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from suggest import TermTrie, WordIndex, build_index, suggest
+from _util import percentile
+
+
+def make_words(count, rng):
+    # Letter frequencies skewed toward the front of the alphabet, so some
+    # prefixes own tens of thousands of words and others a handful
+    letters = string.ascii_lowercase
+    weights = [1 / (i + 1) for i in range(len(letters))]
+    words = {}
+    while len(words) < count:
+        word = "".join(rng.choices(letters, weights, k=rng.randint(3, 12)))
+        words[word] = int(1_000_000 / (len(words) + 1)) + 1
+    return words
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, default=500_000)
+    parser.add_argument("--titles", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=20_000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--target-ms", type=float, default=1.0, help="p99 budget")
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    words = make_words(args.words, rng)
+    start = time.perf_counter()
+    index_bytes = build_index(words)
+    build_s = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "words.idx")
+        with open(path, "wb") as index_file:
+            index_file.write(index_bytes)
+        start = time.perf_counter()
+        index = WordIndex.open(path)
+        open_ms = (time.perf_counter() - start) * 1000
+
+        vocabulary = list(words)
+        titles = TermTrie()
+        start = time.perf_counter()
+        for _ in range(args.titles):
+            titles.add(" ".join(rng.sample(vocabulary[:5000], 4)))
+        title_us = (time.perf_counter() - start) / args.titles * 1e6
+
+        prefixes = [rng.choice(vocabulary)[:rng.randint(1, 4)] for _ in range(args.queries)]
+        samples = []
+        for prefix in prefixes:
+            start = time.perf_counter()
+            suggest(prefix, args.limit, index, titles)
+            samples.append((time.perf_counter() - start) * 1000)
+        del index
+
+    p99 = percentile(samples, 99)
+    print(f"words={len(words)} index={len(index_bytes) / 1e6:.1f}MB build={build_s:.1f}s open={open_ms:.2f}ms "
+          f"title add={title_us:.0f}us")
+    print(f"queries={len(samples)} p50={statistics.median(samples):.3f}ms p99={p99:.3f}ms "
+          f"max={max(samples):.3f}ms (target p99 < {args.target_ms}ms)")
+    sys.exit(0 if p99 < args.target_ms else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""POST /posts throughput with and without group-commit write batching.
+
+Points the app in main.py at a scratch database on MONGODB_URL and has a
+number of concurrent clients create posts through the ASGI app, first with
+one insert_one per request and then with WRITE_BATCHING's insert queue
+(one insert_many per batch). Prints posts per second, latency percentiles
+and, for the batched run, the average batch size.
+
+    cd backend
+    MONGODB_URL=mongodb://localhost:27017 python benchmarks/write_batching.py --clients 64 --posts 5000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# Every request comes from the same user; the write limit would cap the run
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import httpx
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import main
+from _util import create_posts, percentile
+
+
+async def run(args):
+    client = AsyncIOMotorClient(main.MONGODB_URL, maxPoolSize=args.clients)
+    database = client[f"{main.DATABASE_NAME}_write_batching"]
+    await client.drop_database(database.name)
+    main.users_collection = database.users
+    main.posts_collection = database.posts
+    main.categories_collection = database.categories
+    await main.ensure_indexes()
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        response = await http.post("/auth/signup", json={
+            "username": "writer", "email": "writer@example.com", "password": "secret"})
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        await create_posts(http, headers, args.clients, args.clients)  # warm up connections
+
+        print(f"clients={args.clients} posts={args.posts} max_docs={args.max_docs} max_delay={args.max_delay_ms}ms")
+        for batching in (False, True):
+            await database.posts.delete_many({})
+            if batching:
+                main.insert_batcher = main.PostInsertBatcher(args.max_docs, args.max_delay_ms / 1000, args.posts)
+                main.insert_batcher.start()
+            samples, elapsed = await create_posts(http, headers, args.posts, args.clients)
+            line = (f"{'batched' if batching else 'insert_one':<11} posts/s={len(samples) / elapsed:,.0f} "
+                    f"p50={statistics.median(samples):.2f}ms p99={percentile(samples, 99):.2f}ms")
+            if batching:
+                batcher = main.insert_batcher
+                await batcher.close()
+                main.insert_batcher = None
+                line += f" avg batch={batcher.documents / max(batcher.batches, 1):.1f}"
+            print(line)
+
+    await client.drop_database(database.name)
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--max-docs", type=int, default=main.WRITE_BATCH_MAX_DOCS)
+    parser.add_argument("--max-delay-ms", type=float, default=main.WRITE_BATCH_MAX_DELAY_MS)
+    asyncio.run(run(parser.parse_args()))
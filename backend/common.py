@@ -0,0 +1,576 @@
+"""Infrastructure shared by main.py (MongoDB) and main_test.py (in memory).
+
+Request metrics and their middleware, the TTL cache and response cache, post
+serialization, the SSE change feed, token-bucket rate limiting, the bcrypt
+worker pool, cursors and the request models that are the same for both apps.
+Anything that touches the store, or differs in shape between the apps (id vs
+_id), stays in the app; main.py extends the metrics with its Mongo command
+timings. Classes take their settings as arguments; the apps read the
+environment.
+"""
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import datetime
+from typing import List, Optional
+import asyncio
+import base64
+import bisect
+import hashlib
+import json
+import math
+import os
+import signal
+import time
+
+from fastapi import HTTPException, Request, Response, status
+from pydantic import BaseModel
+import orjson
+
+# Metrics
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Histogram:
+    # Per-bucket counts; render() makes them cumulative as Prometheus expects
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str):
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+class Metrics:
+    # Request metrics; only touched on the event loop
+    def __init__(self):
+        self.requests_in_flight = 0
+        self.request_latency = {}  # (method, route) -> Histogram
+        self.request_status = {}  # (method, route, status) -> count
+
+    def observe_request(self, method: str, route: str, status_code: int, seconds: float):
+        key = (method, route)
+        histogram = self.request_latency.get(key)
+        if histogram is None:
+            histogram = self.request_latency[key] = Histogram()
+        histogram.observe(seconds)
+        status_key = (method, route, status_code)
+        self.request_status[status_key] = self.request_status.get(status_key, 0) + 1
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_requests_in_flight Requests currently being served.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.requests_in_flight}",
+            "# HELP http_request_duration_seconds Request latency by route template.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), histogram in sorted(self.request_latency.items()):
+            lines += histogram.render("http_request_duration_seconds", f'method="{method}",route="{label_value(route)}"')
+        lines += ["# HELP http_requests_total Responses by route template and status.", "# TYPE http_requests_total counter"]
+        for (method, route, status_code), count in sorted(self.request_status.items()):
+            lines.append(f'http_requests_total{{method="{method}",route="{label_value(route)}",status="{status_code}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+class MetricsMiddleware:
+    # Plain ASGI so streamed responses are timed until their last chunk is sent.
+    # Subclasses track more per request by overriding begin() and end().
+    def __init__(self, app, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+
+    def begin(self):
+        # Called as the request starts; the result is handed to end()
+        return None
+
+    def end(self, scope, status_code: int, elapsed: float, state):
+        pass
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status_code = 500
+        state = self.begin()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        self.metrics.requests_in_flight += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.metrics.requests_in_flight -= 1
+            elapsed = time.perf_counter() - start
+            # Label by route template, not raw path, so ids don't explode cardinality
+            route = scope.get("route")
+            route_path = route.path if route is not None else "unmatched"
+            self.metrics.observe_request(scope["method"], route_path, status_code, elapsed)
+            self.end(scope, status_code, elapsed, state)
+
+# Pydantic models
+class UserCreate(BaseModel):
+    username: str
+    email: str
+    password: str
+
+class UserLogin(BaseModel):
+    username: str
+    password: str
+
+class Token(BaseModel):
+    access_token: str
+    token_type: str
+
+class PostCreate(BaseModel):
+    title: str
+    content: str
+    category: Optional[str] = "general"
+
+class PostUpdate(BaseModel):
+    title: Optional[str] = None
+    content: Optional[str] = None
+    category: Optional[str] = None
+
+class PostBatchUpdate(PostUpdate):
+    id: str
+
+class CategoryCount(BaseModel):
+    category: Optional[str]
+    count: int
+
+class Suggestion(BaseModel):
+    word: str
+    frequency: int
+
+class SpellSuggestion(BaseModel):
+    word: str
+    distance: int
+    frequency: int
+
+# Caching
+class TTLCache:
+    # Bounded LRU cache whose entries also expire after a TTL
+    def __init__(self, maxsize: int, ttl: float, on_evict=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.on_evict = on_evict  # called with (key, value) whenever an entry is dropped
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            if entry is not None:
+                self.invalidate(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if self.maxsize <= 0 or ttl <= 0:
+            return
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self.invalidate(next(iter(self._entries)))
+
+    def invalidate(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None and self.on_evict is not None:
+            self.on_evict(key, entry[0])
+
+    def clear(self):
+        for key in list(self._entries):
+            self.invalidate(key)
+
+    def stats(self):
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+def render_caches(caches: dict) -> str:
+    # Prometheus lines for {name: TTLCache}, one series per cache
+    stats = {name: cache.stats() for name, cache in caches.items()}
+    lines = []
+    for metric, key, kind in (("cache_entries", "size", "gauge"), ("cache_hits_total", "hits", "counter"), ("cache_misses_total", "misses", "counter")):
+        lines.append(f"# TYPE {metric} {kind}")
+        lines += [f'{metric}{{cache="{name}"}} {values[key]}' for name, values in stats.items()]
+    return "\n".join(lines) + "\n"
+
+def category_tag(category: Optional[str]) -> str:
+    # Response cache tag on category-filtered pages, dropped when a post moves into the category
+    return f"category:{category}"
+
+POST_FIELDS = ("title", "content", "category", "author_id", "author_username", "created_at", "updated_at")
+SUMMARY_FIELDS = ("title", "category", "author_id", "author_username", "created_at", "updated_at")
+
+def resolve_fields(view: str, fields: Optional[str]):
+    # None means the full post; otherwise the requested subset, id always included
+    if fields:
+        requested = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+        unknown = [f for f in requested if f not in POST_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        return requested
+    return SUMMARY_FIELDS if view == "summary" else None
+
+def post_serializer(id_key: str):
+    # Returns post_to_dict, the single document -> response conversion for
+    # every post route, with the post id under id_key ("_id" in main.py, "id"
+    # in main_test.py). Routes return ORJSONResponse directly, so Post serves
+    # only as the OpenAPI schema and nothing is validated or serialized twice.
+    def post_to_dict(post: dict, fields: Optional[tuple] = None) -> dict:
+        if fields is not None:
+            item = {id_key: str(post["_id"])}
+            for field in fields:
+                item[field] = str(post[field]) if field == "author_id" else post[field]
+            if "excerpt" in post:
+                item["excerpt"] = post["excerpt"]
+            return item
+        return {
+            id_key: str(post["_id"]),
+            "title": post["title"],
+            "content": post["content"],
+            "category": post["category"],
+            "author_id": str(post["author_id"]),
+            "author_username": post["author_username"],
+            "created_at": post["created_at"],
+            "updated_at": post["updated_at"],
+        }
+    return post_to_dict
+
+def make_etag(posts) -> str:
+    # Strong validator derived from each post document's id and updated_at
+    digest = hashlib.sha1()
+    for post in posts:
+        digest.update(f"{post['_id']}:{post['updated_at'].isoformat()};".encode())
+    return f'"{digest.hexdigest()}"'
+
+def cache_entry(body: bytes, posts, headers: Optional[dict] = None) -> dict:
+    return {"body": body, "etag": make_etag(posts), "headers": headers or {}}
+
+def cached_response(request: Request, entry: dict) -> Response:
+    # A matching If-None-Match gets a bodiless 304; nothing is re-serialized either way
+    headers = {"ETag": entry["etag"], **entry["headers"]}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" in tags or entry["etag"] in tags:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
+
+class ResponseCache:
+    # Serialized GET responses keyed by route and query. Each entry is tagged
+    # with the post ids it contains so a write drops only the entries it
+    # affects; offset (skip) pages are tracked too, since any insert or delete
+    # shifts them, while cursor pages only change when one of their posts does.
+    def __init__(self, maxsize: int, ttl: float):
+        self.entries = TTLCache(maxsize, ttl, on_evict=self._forget)
+        self.keys_by_post = {}  # post_id -> cache keys whose body includes it
+        self.offset_keys = set()
+        self.generation = 0  # bumped by every invalidation
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, entry: dict, post_ids: List[str], offset_page: bool = False):
+        if self.entries.maxsize <= 0 or self.entries.ttl <= 0:
+            return
+        self.entries.invalidate(key)
+        entry["post_ids"] = post_ids
+        self.entries.set(key, entry)
+        for post_id in post_ids:
+            self.keys_by_post.setdefault(post_id, set()).add(key)
+        if offset_page:
+            self.offset_keys.add(key)
+
+    def invalidate_post(self, post_id: str):
+        self.generation += 1
+        for key in list(self.keys_by_post.get(post_id, ())):
+            self.entries.invalidate(key)
+
+    def invalidate_offset_pages(self):
+        self.generation += 1
+        for key in list(self.offset_keys):
+            self.entries.invalidate(key)
+
+    def clear(self):
+        self.generation += 1
+        self.entries.clear()
+
+    def _forget(self, key, entry):
+        self.offset_keys.discard(key)
+        for post_id in entry.get("post_ids", ()):
+            keys = self.keys_by_post.get(post_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.keys_by_post[post_id]
+
+# Change feed
+class Subscriber:
+    __slots__ = ("queue",)
+
+    def __init__(self, queue_size: int):
+        self.queue = asyncio.Queue(queue_size)
+
+class ChangeFeed:
+    # Fans post changes out to GET /posts/stream subscribers. Each event is
+    # encoded once and queued per subscriber; a subscriber whose bounded
+    # queue is full is dropped and told to reset rather than slowing the
+    # publisher or buffering without limit.
+    def __init__(self, queue_size: int, heartbeat: float):
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat  # seconds between keepalive comments while idle
+        self.subscribers = set()
+        self.dropped = 0
+        self.stopped = False
+
+    def publish(self, event: str, data: dict):
+        if not self.subscribers:
+            return
+        message = b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                self.end(subscriber)
+
+    def end(self, subscriber: Subscriber):
+        # Discard what it hasn't read and leave only the end-of-stream marker
+        self.subscribers.discard(subscriber)
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+
+    def close(self):
+        # Ends every open stream; clients reload and reconnect
+        for subscriber in list(self.subscribers):
+            self.end(subscriber)
+
+    def stop(self):
+        # Ends every open stream and any opened after, for shutdown
+        self.stopped = True
+        self.close()
+
+    def stop_on_signals(self):
+        # uvicorn waits for open connections to finish before it runs the
+        # lifespan shutdown, so a stream still open then would hold the
+        # process until --timeout-graceful-shutdown. Stop the feed as soon as
+        # SIGINT/SIGTERM arrives instead. The event loop is still woken
+        # through the wakeup fd, so uvicorn's own handlers run as before;
+        # ours only stops the feed and then calls whatever was installed.
+        self.stopped = False
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            previous = signal.getsignal(sig)
+
+            def handler(signum, frame, previous=previous):
+                if not loop.is_closed():
+                    loop.call_soon_threadsafe(self.stop)
+                if callable(previous):
+                    previous(signum, frame)
+
+            try:
+                signal.signal(sig, handler)
+            except ValueError:
+                return  # not the main thread (tests, a worker thread)
+
+    async def stream(self):
+        # SSE body: queued events, a comment line as keepalive while idle, and
+        # a final "reset" event (reload, then reconnect) once the stream ends
+        subscriber = Subscriber(self.queue_size)
+        self.subscribers.add(subscriber)
+        if self.stopped:
+            self.end(subscriber)
+        try:
+            yield b"retry: 5000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if message is None:
+                    yield b"event: reset\ndata: {}\n\n"
+                    return
+                yield message
+        finally:
+            self.subscribers.discard(subscriber)
+
+    def render(self) -> str:
+        return (
+            "# TYPE sse_subscribers gauge\n"
+            f"sse_subscribers {len(self.subscribers)}\n"
+            "# TYPE sse_dropped_subscribers_total counter\n"
+            f"sse_dropped_subscribers_total {self.dropped}\n"
+        )
+
+# Rate limiting
+def parse_rate(spec: str):
+    # "<count>/<second|minute|hour>" -> (tokens refilled per second, burst size)
+    count, _, unit = spec.partition("/")
+    return int(count) / {"second": 1, "minute": 60, "hour": 3600}[unit.strip()], int(count)
+
+def rate_limits_from_env() -> dict:
+    # Per route, the limits applied and what each is keyed on
+    return {
+        "signup": {
+            "ip": parse_rate(os.getenv("RATE_LIMIT_SIGNUP_IP", "10/minute")),
+            "username": parse_rate(os.getenv("RATE_LIMIT_SIGNUP_USERNAME", "5/minute")),
+        },
+        "login": {
+            "ip": parse_rate(os.getenv("RATE_LIMIT_LOGIN_IP", "30/minute")),
+            "username": parse_rate(os.getenv("RATE_LIMIT_LOGIN_USERNAME", "10/minute")),
+        },
+        "post_write": {
+            "user": parse_rate(os.getenv("RATE_LIMIT_POST_WRITE_USER", "60/minute")),
+        },
+    }
+
+class RateLimitBackend(ABC):
+    # Token bucket store. acquire() takes one token from the bucket at key and
+    # returns 0 if it had one, else the seconds until it will. main.py also
+    # has a Mongo-backed implementation.
+    @abstractmethod
+    async def acquire(self, key: str, rate: float, burst: int) -> float:
+        ...
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    # Per-process buckets in least-recently-used order. A bucket left idle
+    # until it has refilled is the same as a new one, so it is dropped; past
+    # maxsize the least recently used bucket goes regardless.
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at, full_at)
+
+    async def acquire(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        while self._buckets and next(iter(self._buckets.values()))[2] <= now:
+            self._buckets.popitem(last=False)
+        tokens, updated_at, _ = self._buckets.pop(key, (burst, now, now))
+        tokens = min(burst, tokens + (now - updated_at) * rate)
+        retry_after = 0.0 if tokens >= 1 else (1 - tokens) / rate
+        if not retry_after:
+            tokens -= 1
+        self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+class RateLimiter:
+    # Applies the per-route limits against a backend, which an app may swap
+    # at startup (main.py does for RATE_LIMIT_BACKEND=mongo)
+    def __init__(self, backend: RateLimitBackend, limits: dict, enabled: bool = True):
+        self.backend = backend
+        self.limits = limits
+        self.enabled = enabled
+
+    async def enforce(self, route: str, **keys):
+        # keys gives the caller's value for each limit kind of the route, e.g. ip=, username=
+        if not self.enabled:
+            return
+        for kind, (rate, burst) in self.limits[route].items():
+            retry_after = await self.backend.acquire(f"{route}:{kind}:{keys[kind]}", rate, burst)
+            if retry_after:
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many requests, please retry later",
+                    headers={"Retry-After": str(math.ceil(retry_after))},
+                )
+
+def client_ip(request: Request) -> str:
+    # The socket peer; run uvicorn with --proxy-headers behind a trusted proxy
+    return request.client.host if request.client else "unknown"
+
+# Passwords
+# Created on first use: passlib costs imports that startup doesn't need
+# (see benchmarks/cold_start.py)
+_pwd_context = None
+
+def password_context():
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
+def verify_password(plain_password, hashed_password):
+    return password_context().verify(plain_password, hashed_password)
+
+def get_password_hash(password):
+    return password_context().hash(password)
+
+class PasswordPool:
+    # bcrypt is CPU-bound, so it runs in a bounded worker pool instead of on
+    # the event loop. The pool starts on first use; past max_pending queued
+    # jobs, callers get a 503 instead of waiting.
+    def __init__(self, executor: str, workers: int, max_pending: int):
+        self.executor_kind = executor  # "thread" or "process"
+        self.workers = workers
+        self.max_pending = max_pending
+        self.executor = None
+        self.pending = 0
+
+    async def run(self, func, *args):
+        if self.executor is None:
+            if self.executor_kind == "process":
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+# Pagination and batches
+def encode_cursor(created_at: datetime, post_id) -> str:
+    # Opaque keyset cursor over (created_at, _id), the sort key of GET /posts
+    raw = json.dumps({"t": created_at.isoformat(), "id": str(post_id)})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def batch_result(post_id: str, status_code: int, detail: Optional[str] = None, post: Optional[dict] = None) -> dict:
+    # Same shape as BatchItemResult, built directly for ORJSONResponse
+    return {"id": post_id, "status": status_code, "detail": detail, "post": post}
+
+def check_batch_size(items: list, max_size: int):
+    if not items:
+        raise HTTPException(status_code=400, detail="Batch is empty")
+    if len(items) > max_size:
+        raise HTTPException(status_code=400, detail=f"Batch exceeds the maximum of {max_size} items")
@@ -1,20 +1,49 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Body, Query, Request, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Literal, Union
 from datetime import datetime, timedelta
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 import os
 from dotenv import load_dotenv
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure, PyMongoError, ServerSelectionTimeoutError, WaitQueueTimeoutError, WriteError
+from spell import SpellIndex, TermSpellIndex, spell
+from suggest import TermTrie, WordIndex, suggest
+from common import (
+    CategoryCount, ChangeFeed, Histogram, MemoryRateLimitBackend, Metrics, MetricsMiddleware, PasswordPool,
+    PostBatchUpdate, PostCreate, POST_FIELDS, PostUpdate, RateLimitBackend, RateLimiter, ResponseCache,
+    SpellSuggestion, Suggestion, Token, TTLCache, UserCreate, UserLogin, batch_result, cache_entry, cached_response,
+    category_tag, check_batch_size, client_ip, encode_cursor, get_password_hash, label_value, post_serializer,
+    rate_limits_from_env, render_caches, resolve_fields, verify_password,
+)
 import asyncio
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+import base64
+import json
+import logging
+import orjson
+import threading
+import time
 
 load_dotenv()
 
-app = FastAPI(title="Full-Stack Template API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # startup() and shutdown() live under "# Startup" next to what they manage
+    await startup()
+    try:
+        yield
+    finally:
+        await shutdown()
+
+app = FastAPI(title="Full-Stack Template API", version="1.0.0", default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -23,79 +52,535 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-Total-Count"],
 )
 
 # Security
 security = HTTPBearer()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # Configuration
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-this")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")  # "thread" or "process"
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+CHECK_QUERY_PLANS = os.getenv("CHECK_QUERY_PLANS", "false").lower() == "true"
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "100"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1000"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30"))
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "100"))  # events a /posts/stream client may fall behind by
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+MAX_EXCERPT_LENGTH = 1000
+MAX_SUGGEST_LIMIT = 20
+WORDLIST_PATH = os.getenv("WORDLIST_PATH", "")  # word list, or an index built by `python suggest.py build`
+SPELL_INDEX_PATH = os.getenv("SPELL_INDEX_PATH", "")  # word list, or an index built by `python spell.py build`
+SPELL_MAX_POST_TERMS = int(os.getenv("SPELL_MAX_POST_TERMS", "50000"))
+WORD_INDEX_MAX_POSTS = int(os.getenv("WORD_INDEX_MAX_POSTS", "20000"))  # newest posts indexed for /suggest and /spell
+MAX_SPELL_LIMIT = 20
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))  # 0 disables the slow-request log
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # "memory" or "mongo" (shared across workers)
+RATE_LIMIT_MAX_BUCKETS = int(os.getenv("RATE_LIMIT_MAX_BUCKETS", "100000"))
 MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "fullstack_template")
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "10"))
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "1000"))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+WRITE_BATCHING = os.getenv("WRITE_BATCHING", "false").lower() == "true"  # group POST /posts inserts
+WRITE_BATCH_MAX_DOCS = int(os.getenv("WRITE_BATCH_MAX_DOCS", "100"))
+WRITE_BATCH_MAX_DELAY_MS = float(os.getenv("WRITE_BATCH_MAX_DELAY_MS", "2"))
+WRITE_BATCH_MAX_PENDING = int(os.getenv("WRITE_BATCH_MAX_PENDING", "1000"))
 
-# MongoDB client
-client = AsyncIOMotorClient(MONGODB_URL)
-database = client[DATABASE_NAME]
-users_collection = database.users
-posts_collection = database.posts
+logger = logging.getLogger(__name__)
 
-# Pydantic models
-class UserCreate(BaseModel):
-    username: str
-    email: str
-    password: str
+# Metrics
+class MongoMetrics(Metrics):
+    # Adds Mongo command metrics, which arrive from Motor's worker threads
+    # and take the lock
+    def __init__(self):
+        super().__init__()
+        self.command_latency = {}  # command name -> Histogram
+        self.command_documents = {}  # command name -> documents returned
+        self.command_failures = {}  # command name -> count
+        self.lock = threading.Lock()
 
-class UserLogin(BaseModel):
-    username: str
-    password: str
+    def observe_command(self, command: str, seconds: float, documents: int, failed: bool = False):
+        with self.lock:
+            histogram = self.command_latency.get(command)
+            if histogram is None:
+                histogram = self.command_latency[command] = Histogram()
+            histogram.observe(seconds)
+            self.command_documents[command] = self.command_documents.get(command, 0) + documents
+            if failed:
+                self.command_failures[command] = self.command_failures.get(command, 0) + 1
+
+    def render(self) -> str:
+        lines = []
+        with self.lock:
+            lines += ["# HELP mongodb_command_duration_seconds Mongo command round-trip time.", "# TYPE mongodb_command_duration_seconds histogram"]
+            for command, histogram in sorted(self.command_latency.items()):
+                lines += histogram.render("mongodb_command_duration_seconds", f'command="{label_value(command)}"')
+            lines += ["# HELP mongodb_command_documents_returned_total Documents returned by Mongo commands.", "# TYPE mongodb_command_documents_returned_total counter"]
+            for command, count in sorted(self.command_documents.items()):
+                lines.append(f'mongodb_command_documents_returned_total{{command="{label_value(command)}"}} {count}')
+            lines += ["# HELP mongodb_command_failures_total Mongo commands that failed.", "# TYPE mongodb_command_failures_total counter"]
+            for command, count in sorted(self.command_failures.items()):
+                lines.append(f'mongodb_command_failures_total{{command="{label_value(command)}"}} {count}')
+        return super().render() + "\n".join(lines) + "\n"
+
+metrics = MongoMetrics()
+
+# Mongo calls made by the current request; only set when the slow-request log is on
+request_commands: ContextVar[Optional[list]] = ContextVar("request_commands", default=None)
+
+def reply_documents(reply: dict) -> int:
+    cursor = reply.get("cursor")
+    if cursor is not None:
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", ())))
+    if "value" in reply:  # findAndModify
+        return 0 if reply["value"] is None else 1
+    return 0
+
+class MongoCommandListener(monitoring.CommandListener):
+    # Runs on Motor's worker threads, which copy the calling task's context,
+    # so request_commands resolves to the request that issued the command
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event, reply_documents(event.reply), failed=False)
+
+    def failed(self, event):
+        self._record(event, 0, failed=True)
+
+    def _record(self, event, documents: int, failed: bool):
+        seconds = event.duration_micros / 1e6
+        metrics.observe_command(event.command_name, seconds, documents, failed)
+        calls = request_commands.get()
+        if calls is not None:
+            calls.append((event.command_name, seconds, documents, failed))
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    # Connection pool occupancy summed over every server the client talks to;
+    # events come from driver threads, hence the lock
+    def __init__(self):
+        self.open = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.checkout_failures = 0
+        self.lock = threading.Lock()
+
+    def _add(self, **deltas):
+        with self.lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def connection_created(self, event):
+        self._add(open=1)
+
+    def connection_closed(self, event):
+        self._add(open=-1)
+
+    def connection_check_out_started(self, event):
+        self._add(waiting=1)
+
+    def connection_checked_out(self, event):
+        self._add(waiting=-1, in_use=1)
+
+    def connection_check_out_failed(self, event):
+        self._add(waiting=-1, checkout_failures=1)
+
+    def connection_checked_in(self, event):
+        self._add(in_use=-1)
+
+    def connection_ready(self, event):
+        pass
 
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def stats(self):
+        with self.lock:
+            return {
+                "open": self.open,
+                "in_use": self.in_use,
+                "wait_queue": self.waiting,
+                "max_size": MONGODB_MAX_POOL_SIZE,
+                "utilization": round(self.in_use / MONGODB_MAX_POOL_SIZE, 3) if MONGODB_MAX_POOL_SIZE else 0.0,
+                "checkout_failures": self.checkout_failures,
+            }
+
+    def render(self) -> str:
+        stats = self.stats()
+        return "".join(
+            f"# TYPE mongodb_pool_{name} {kind}\nmongodb_pool_{name} {stats[key]}\n"
+            for name, key, kind in (
+                ("connections_open", "open", "gauge"),
+                ("connections_in_use", "in_use", "gauge"),
+                ("wait_queue_depth", "wait_queue", "gauge"),
+                ("max_size", "max_size", "gauge"),
+                ("checkout_failures_total", "checkout_failures", "counter"),
+            )
+        )
+
+pool_monitor = PoolMonitor()
+
+class MongoMetricsMiddleware(MetricsMiddleware):
+    # Also collects the request's Mongo calls for the slow-request log
+    def begin(self):
+        calls = [] if SLOW_REQUEST_MS > 0 else None
+        return calls, request_commands.set(calls)
+
+    def end(self, scope, status_code: int, elapsed: float, state):
+        calls, token = state
+        request_commands.reset(token)
+        if calls is not None and elapsed * 1000 >= SLOW_REQUEST_MS:
+            log_slow_request(scope, status_code, elapsed, calls)
+
+def log_slow_request(scope, status_code: int, elapsed: float, calls: list):
+    mongo_ms = sum(call[1] for call in calls) * 1000
+    summary = ", ".join(
+        f"{name} {seconds * 1000:.1f}ms/{documents} docs{' FAILED' if failed else ''}"
+        for name, seconds, documents, failed in calls
+    )
+    logger.warning(
+        "Slow request %s %s -> %s in %.1fms; %d Mongo calls (%.1fms): %s",
+        scope["method"], scope["path"], status_code, elapsed * 1000, len(calls), mongo_ms, summary or "none",
+    )
+
+app.add_middleware(MongoMetricsMiddleware, metrics=metrics)
+
+# MongoDB client; created, pre-warmed and closed by the lifespan handler
+client = None
+database = None
+users_collection = None
+posts_collection = None
+categories_collection = None  # category -> post count, kept in step by every post write
+ready = False
+
+# Pydantic models
 class User(BaseModel):
     id: str = Field(alias="_id")
     username: str
     email: str
     created_at: datetime
+    post_count: int = 0
 
     class Config:
         populate_by_name = True
 
-class Token(BaseModel):
-    access_token: str
-    token_type: str
-
-class PostCreate(BaseModel):
+class Post(BaseModel):
+    id: str = Field(alias="_id")
     title: str
     content: str
-    category: Optional[str] = "general"
+    category: str
+    author_id: str
+    author_username: str
+    created_at: datetime
+    updated_at: datetime
 
-class PostUpdate(BaseModel):
-    title: Optional[str] = None
-    content: Optional[str] = None
-    category: Optional[str] = None
+    class Config:
+        populate_by_name = True
 
-class Post(BaseModel):
+class PostSummary(BaseModel):
+    # Slim list item for GET /posts?view=summary; content is replaced by an optional excerpt
     id: str = Field(alias="_id")
     title: str
-    content: str
     category: str
     author_id: str
     author_username: str
     created_at: datetime
     updated_at: datetime
+    excerpt: Optional[str] = None
 
     class Config:
         populate_by_name = True
 
+class BatchItemResult(BaseModel):
+    id: Optional[str] = None
+    status: int
+    detail: Optional[str] = None
+    post: Optional[Post] = None
+
+# Caching
+class SingleFlight:
+    # Concurrent calls with the same key share one execution: the first
+    # caller starts it as a task and later callers await that task's result
+    # or exception. Callers await it through a shield, so one that gives up
+    # (client disconnected) doesn't cancel it for the rest.
+    def __init__(self):
+        self.calls = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key, func):
+        task = self.calls.get(key)
+        if task is None:
+            task = asyncio.create_task(func())
+            self.calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self.executed += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        if self.calls.get(key) is task:
+            del self.calls[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here in case every caller gave up
+
+    def render(self) -> str:
+        return (
+            "# TYPE read_flights_total counter\n"
+            f"read_flights_total {self.executed}\n"
+            "# TYPE read_flights_coalesced_total counter\n"
+            f"read_flights_coalesced_total {self.coalesced}\n"
+        )
+
+# Write batching
+class PostInsertBatcher:
+    # Group commit for POST /posts: each caller queues its document and waits
+    # while a background task flushes up to max_docs of them with a single
+    # insert_many (and one category counter update), waiting at most
+    # max_delay seconds for a batch to fill. Inserts are unordered, so a bad
+    # document fails only its own caller. A full queue sheds new inserts with
+    # a 503 instead of letting them pile up.
+    def __init__(self, max_docs: int, max_delay: float, max_pending: int):
+        self.max_docs = max(max_docs, 1)
+        self.max_delay = max_delay
+        self.queue = asyncio.Queue(max_pending)
+        self.task = None
+        self.closing = False
+        self.batches = 0
+        self.documents = 0
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def insert(self, document: dict) -> ObjectId:
+        # Resolves with the document's _id once its batch is written
+        if self.closing:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is shutting down",
+                headers={"Retry-After": "1"},
+            )
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((document, future))
+        except asyncio.QueueFull:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        return await future
+
+    async def close(self):
+        # Refuse new inserts, then let the task write everything already queued
+        self.closing = True
+        if self.task is not None:
+            await self.queue.put(None)
+            await self.task
+            self.task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self.queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_docs:
+                if self.queue.empty():
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self.queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self.queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: list):
+        # Callers that gave up (client disconnected) before the flush are skipped
+        batch = [(document, future) for document, future in batch if not future.done()]
+        if not batch:
+            return
+        failed = {}
+        try:
+            await posts_collection.insert_many([document for document, _ in batch], ordered=False)
+        except BulkWriteError as exc:
+            failed = {error["index"]: WriteError(error["errmsg"], error["code"], error) for error in exc.details["writeErrors"]}
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        self.batches += 1
+        self.documents += len(batch) - len(failed)
+        inserted = [document for index, (document, _) in enumerate(batch) if index not in failed]
+        try:
+            await asyncio.gather(
+                adjust_category_counts(Counter(document["category"] for document in inserted)),
+                adjust_post_counts(Counter(author_key(document) for document in inserted)),
+            )
+        except PyMongoError:
+            logger.exception("Category or author counts missed a batch of %d inserted posts", len(inserted))
+        for index, (document, future) in enumerate(batch):
+            if future.done():
+                continue
+            if index in failed:
+                future.set_exception(failed[index])
+            else:
+                future.set_result(document["_id"])
+
+    def render(self) -> str:
+        return (
+            "# TYPE post_insert_batches_total counter\n"
+            f"post_insert_batches_total {self.batches}\n"
+            "# TYPE post_insert_batch_documents_total counter\n"
+            f"post_insert_batch_documents_total {self.documents}\n"
+            "# TYPE post_insert_queue_depth gauge\n"
+            f"post_insert_queue_depth {self.queue.qsize()}\n"
+        )
+
+# Rate limiting
+class MongoRateLimitBackend(RateLimitBackend):
+    # Buckets shared by every worker, one atomic pipeline update per check
+    # (MongoDB 4.2+). Refill uses the server clock ($$NOW) so worker clock skew
+    # doesn't matter, and a TTL index removes buckets once they are full again.
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def acquire(self, key: str, rate: float, burst: int) -> float:
+        elapsed = {"$divide": [{"$subtract": ["$$NOW", {"$ifNull": ["$updated_at", "$$NOW"]}]}, 1000]}
+        refilled = {"$min": [burst, {"$add": [{"$ifNull": ["$tokens", burst]}, {"$multiply": [elapsed, rate]}]}]}
+        pipeline = [
+            {"$set": {"tokens": refilled, "updated_at": "$$NOW"}},
+            {"$set": {
+                "allowed": {"$gte": ["$tokens", 1]},
+                "tokens": {"$cond": [{"$gte": ["$tokens", 1]}, {"$subtract": ["$tokens", 1]}, "$tokens"]},
+            }},
+            {"$set": {"expires_at": {"$add": ["$$NOW", {"$multiply": [{"$subtract": [burst, "$tokens"]}, 1000 / rate]}]}}},
+        ]
+        try:
+            bucket = await self.collection.find_one_and_update(
+                {"_id": key}, pipeline, upsert=True, return_document=ReturnDocument.AFTER)
+        except DuplicateKeyError:
+            # Two workers upserted the same new bucket; the document exists now
+            bucket = await self.collection.find_one_and_update(
+                {"_id": key}, pipeline, upsert=True, return_document=ReturnDocument.AFTER)
+        return 0.0 if bucket["allowed"] else (1 - bucket["tokens"]) / rate
+
+# The backend is replaced by MongoRateLimitBackend at startup when RATE_LIMIT_BACKEND=mongo
+rate_limiter = RateLimiter(MemoryRateLimitBackend(RATE_LIMIT_MAX_BUCKETS), rate_limits_from_env(), RATE_LIMIT_ENABLED)
+password_pool = PasswordPool(PASSWORD_HASH_EXECUTOR, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
+
 # Helper functions
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(data["t"]), ObjectId(data["id"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def parse_post_id(post_id: str) -> ObjectId:
+    try:
+        return ObjectId(post_id)
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid post ID")
+
+async def raise_missing_or_forbidden(object_id: ObjectId, action: str):
+    # Only reached when an author-filtered write matched nothing: one extra
+    # lookup tells a missing post apart from someone else's
+    if await posts_collection.find_one({"_id": object_id}, {"_id": 1}) is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    raise HTTPException(status_code=403, detail=f"Not authorized to {action} this post")
+
+def parse_object_ids(post_ids: List[str]):
+    # Maps each requested id to its ObjectId, or None if it is malformed
+    parsed = {}
+    for post_id in post_ids:
+        try:
+            parsed[post_id] = ObjectId(post_id)
+        except (InvalidId, TypeError):
+            parsed[post_id] = None
+    return parsed
+
+async def check_batch_authorship(parsed_ids: dict, current_user: dict):
+    # One query for the whole batch; returns the ids the user may modify,
+    # error results for the rest keyed by requested id, and the found posts'
+    # current author and category (ObjectId -> document) so writes can keep
+    # the category counters in step
+    object_ids = [oid for oid in parsed_ids.values() if oid is not None]
+    previous = {}
+    async for post in posts_collection.find({"_id": {"$in": object_ids}}, {"author_id": 1, "category": 1}):
+        previous[post["_id"]] = post
+
+    allowed, errors = {}, {}
+    for post_id, oid in parsed_ids.items():
+        if oid is None:
+            errors[post_id] = batch_result(post_id, 400, "Invalid post ID")
+        elif oid not in previous:
+            errors[post_id] = batch_result(post_id, 404, "Post not found")
+        elif previous[oid]["author_id"] != current_user["_id"]:
+            errors[post_id] = batch_result(post_id, 403, "Not authorized to modify this post")
+        else:
+            allowed[post_id] = oid
+    return allowed, errors, previous
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def adjust_category_counts(deltas: Counter):
+    # One bulk write of $inc upserts, each atomic on its own counter document
+    operations = [UpdateOne({"_id": category}, {"$inc": {"count": delta}}, upsert=True)
+                  for category, delta in deltas.items() if delta]
+    if operations:
+        await categories_collection.bulk_write(operations, ordered=False)
+
+def author_key(post: dict) -> tuple:
+    # adjust_post_counts() key: the author's _id, plus the username their cached document is under
+    return post["author_id"], post["author_username"]
+
+async def adjust_post_counts(deltas: Counter):
+    # post_count on each author's user document, kept like the category counters
+    operations = [UpdateOne({"_id": author_id}, {"$inc": {"post_count": delta}})
+                  for (author_id, _), delta in deltas.items() if delta]
+    if operations:
+        await users_collection.bulk_write(operations, ordered=False)
+    for _, username in deltas:
+        invalidate_user_cache(username)
+
+post_to_dict = post_serializer("_id")
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    from jose import jwt
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -105,51 +590,393 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# Decoded tokens (token -> username) and user documents (username -> user)
+token_cache = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL_SECONDS)
+user_cache = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL_SECONDS)
+
+def invalidate_user_cache(username: str):
+    # Call whenever a user document is written so stale copies are not served
+    user_cache.invalidate(username)
+
+# Serialized GET /posts and GET /posts/{post_id} responses. A worker
+# invalidates for its own writes straight away and for every worker's writes
+# as they arrive on the posts change stream; without a change stream, other
+# workers' writes show once the TTL runs out.
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_SECONDS)
+
+# Cache misses for the same key share one query while it runs. Flights are
+# keyed by cache generation too, so a read that starts after a write never
+# joins one that started before it.
+read_flights = SingleFlight()
+
+async def load_cached(cache_key: str, load):
+    # load() returns (entry, tags, offset_page); the entry is cached only if
+    # no write invalidated anything while it ran
+    generation = response_cache.generation
+
+    async def fill():
+        entry, tags, offset_page = await load()
+        if response_cache.generation == generation:
+            response_cache.set(cache_key, entry, tags, offset_page=offset_page)
+        return entry
+
+    return await read_flights.do((cache_key, generation), fill)
+
+# Autocomplete and spelling: the dictionary word lists (loaded at startup),
+# the terms of post titles and the vocabulary of titles and content. Each
+# worker indexes the newest WORD_INDEX_MAX_POSTS posts at startup, then its
+# own writes as they are made and every worker's from the posts change
+# stream. What was indexed is kept per post id, so indexing a post twice is
+# a no-op and a delete seen on the change stream, which carries only the id,
+# can still be taken back out; past the limit the oldest post drops out.
+word_index: Optional[WordIndex] = None
+spell_index: Optional[SpellIndex] = None
+title_terms = TermTrie(MAX_SUGGEST_LIMIT)
+post_vocabulary = TermSpellIndex(SPELL_MAX_POST_TERMS)
+indexed_posts = OrderedDict()  # post id -> (title, content) as indexed, oldest first
+
+def index_post_text(post: dict):
+    post_id = str(post["_id"])
+    text = (post["title"], post["content"])
+    previous = indexed_posts.pop(post_id, None)
+    indexed_posts[post_id] = text
+    if previous == text:
+        return
+    if previous is not None:
+        remove_post_text(previous)
+    title_terms.add(text[0])
+    post_vocabulary.add(f"{text[0]} {text[1]}")
+    while len(indexed_posts) > WORD_INDEX_MAX_POSTS:
+        remove_post_text(indexed_posts.popitem(last=False)[1])
+
+def unindex_post_text(post_id: str):
+    previous = indexed_posts.pop(post_id, None)
+    if previous is not None:
+        remove_post_text(previous)
+
+def remove_post_text(text: tuple):
+    title_terms.remove(text[0])
+    post_vocabulary.remove(f"{text[0]} {text[1]}")
+
+# GET /posts/stream subscribers, fed from a change stream on posts so each
+# worker's subscribers see every worker's writes
+change_feed = ChangeFeed(SSE_QUEUE_SIZE, SSE_HEARTBEAT_SECONDS)
+change_stream_task = None
+change_stream_live = False
+
+# Created at startup when WRITE_BATCHING is on; create_post inserts directly otherwise
+insert_batcher: Optional[PostInsertBatcher] = None
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        token = credentials.credentials
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+    token = credentials.credentials
+    username = token_cache.get(token)
+    if username is None:
+        from jose import JWTError, jwt
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            username: str = payload.get("sub")
+            if username is None:
+                raise credentials_exception
+        except JWTError:
             raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    user = await users_collection.find_one({"username": username})
+        # Never keep a token cached past its own expiry
+        token_cache.set(token, username, ttl=payload.get("exp", 0) - time.time())
+
+    user = user_cache.get(username)
     if user is None:
-        raise credentials_exception
+        user = await users_collection.find_one({"username": username})
+        if user is None:
+            raise credentials_exception
+        user_cache.set(username, user)
     return user
 
+async def get_rate_limited_writer(current_user: dict = Depends(get_current_user)):
+    # get_current_user for post writes, with the per-user write limit applied
+    await rate_limiter.enforce("post_write", user=str(current_user["_id"]))
+    return current_user
+
+# Startup
+async def ensure_indexes():
+    # Idempotent; fails startup if existing data violates a unique index
+    await users_collection.create_index("username", unique=True)
+    await users_collection.create_index("email", unique=True)
+    # (created_at, _id) backs the GET /posts sort and keyset pagination
+    await posts_collection.create_index([("created_at", -1), ("_id", -1)])
+    # GET /users/{user_id}/posts: one author's posts in (created_at, _id) order
+    await posts_collection.create_index([("author_id", 1), ("created_at", -1), ("_id", -1)])
+    # Earlier releases created (author_id, created_at); the index above is a superset of it
+    if "author_id_1_created_at_-1" in await posts_collection.index_information():
+        try:
+            await posts_collection.drop_index("author_id_1_created_at_-1")
+        except OperationFailure as exc:
+            if exc.code != 27:  # IndexNotFound: another worker dropped it first
+                raise
+    # _id is the sort tiebreaker, so it ends the key for GET /posts?category=
+    await posts_collection.create_index([("category", 1), ("created_at", -1), ("_id", -1)])
+    # DELETE /posts/batch marks the posts it is about to delete, then reads them back by the mark
+    await posts_collection.create_index("delete_token", sparse=True)
+    # Full-text search over posts; title matches rank above content matches
+    await posts_collection.create_index(
+        [("title", "text"), ("content", "text")],
+        weights={"title": 3, "content": 1},
+        name="posts_text",
+    )
+
+def plan_stages(plan: dict):
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from plan_stages(child)
+
+async def check_query_plans():
+    # Explain the hot queries and refuse to start if any would scan a whole collection
+    hot_queries = {
+        "users by username": users_collection.find({"username": ""}).limit(1),
+        "users by email": users_collection.find({"email": ""}).limit(1),
+        "posts by date": posts_collection.find().sort([("created_at", -1), ("_id", -1)]).limit(10),
+        "posts by author": posts_collection.find({"author_id": ObjectId()}).sort([("created_at", -1), ("_id", -1)]).limit(10),
+        "posts by category": posts_collection.find({"category": ""}).sort([("created_at", -1), ("_id", -1)]).limit(10),
+    }
+    collscans = []
+    for name, cursor in hot_queries.items():
+        explained = await cursor.explain()
+        if "COLLSCAN" in plan_stages(explained["queryPlanner"]["winningPlan"]):
+            collscans.append(name)
+    if collscans:
+        raise RuntimeError(f"Query plans fall back to COLLSCAN: {', '.join(collscans)}")
+
+def connect_database():
+    global client, database, users_collection, posts_collection, categories_collection
+    client = AsyncIOMotorClient(
+        MONGODB_URL,
+        maxPoolSize=MONGODB_MAX_POOL_SIZE,
+        minPoolSize=MONGODB_MIN_POOL_SIZE,
+        waitQueueTimeoutMS=MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        serverSelectionTimeoutMS=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        event_listeners=[MongoCommandListener(), pool_monitor],
+    )
+    database = client[DATABASE_NAME]
+    users_collection = database.users
+    posts_collection = database.posts
+    categories_collection = database.categories
+
+async def prewarm_pool():
+    # Open minPoolSize connections (handshake and auth included) before the
+    # first request instead of inside its latency. Concurrent pings open most
+    # of them; the driver's background task tops up the rest.
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(max(MONGODB_MIN_POOL_SIZE, 1))))
+    deadline = time.monotonic() + MONGODB_SERVER_SELECTION_TIMEOUT_MS / 1000
+    while pool_monitor.stats()["open"] < MONGODB_MIN_POOL_SIZE and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+
+async def rebuild_category_counts():
+    # One aggregation when the counter collection is empty (first start after
+    # the upgrade); from then on post writes keep the counters current
+    if await categories_collection.find_one({}, {"_id": 1}) is not None:
+        return
+    # Absolute counts, not $inc: workers starting together may all get here,
+    # and each one must write the same totals instead of adding to them
+    operations = [UpdateOne({"_id": group["_id"]}, {"$set": {"count": group["count"]}}, upsert=True)
+                  async for group in posts_collection.aggregate([{"$group": {"_id": "$category", "count": {"$sum": 1}}}])]
+    if operations:
+        await categories_collection.bulk_write(operations, ordered=False)
+
+async def rebuild_post_counts():
+    # Gives users from before post_count existed their count, once; new users
+    # start at zero and post writes keep every count current. A marker
+    # document records that it ran, so later boots skip the users scan.
+    migrations = database.migrations
+    if await migrations.find_one({"_id": "post_counts"}) is not None:
+        return
+    counts = {}
+    async for group in posts_collection.aggregate([{"$group": {"_id": "$author_id", "count": {"$sum": 1}}}]):
+        counts[group["_id"]] = group["count"]
+    operations = [UpdateOne({"_id": user["_id"]}, {"$set": {"post_count": counts.get(user["_id"], 0)}})
+                  async for user in users_collection.find({"post_count": {"$exists": False}}, {"_id": 1})]
+    if operations:
+        await users_collection.bulk_write(operations, ordered=False)
+    await migrations.update_one({"_id": "post_counts"}, {"$set": {"completed_at": datetime.utcnow()}}, upsert=True)
+
+async def load_word_indexes():
+    global word_index, spell_index
+    # A compiled index is only mapped; a plain list is compiled, off the loop
+    if WORDLIST_PATH:
+        word_index = await asyncio.to_thread(WordIndex.open, WORDLIST_PATH)
+    if SPELL_INDEX_PATH:
+        spell_index = post_vocabulary.known = await asyncio.to_thread(SpellIndex.open, SPELL_INDEX_PATH)
+    # Newest first so the limit keeps the newest; indexed oldest first so
+    # they leave in that order
+    cursor = posts_collection.find({}, {"title": 1, "content": 1}).sort([("created_at", -1), ("_id", -1)])
+    posts = await cursor.limit(WORD_INDEX_MAX_POSTS).to_list(None)
+    for post in reversed(posts):
+        index_post_text(post)
+
+def invalidate_change(change: dict):
+    # Drops what a write by any worker affects; this worker's own writes
+    # have already done so, and doing it twice is harmless
+    operation = change["operationType"]
+    post = change.get("fullDocument")
+    response_cache.invalidate_post(str(change["documentKey"]["_id"]))
+    if operation in ("insert", "delete"):
+        response_cache.invalidate_offset_pages()
+    if post is not None and (operation != "update"
+                             or "category" in change["updateDescription"]["updatedFields"]):
+        response_cache.invalidate_post(category_tag(post.get("category")))
+
+def index_change(change: dict):
+    if change["operationType"] == "delete":
+        unindex_post_text(str(change["documentKey"]["_id"]))
+    elif change.get("fullDocument") is not None:
+        index_post_text(change["fullDocument"])
+
+def publish_change(change: dict):
+    invalidate_change(change)
+    index_change(change)
+    operation = change["operationType"]
+    if operation == "delete":
+        change_feed.publish("deleted", {"_id": str(change["documentKey"]["_id"])})
+    elif change.get("fullDocument") is not None:
+        # None when the post was deleted before the update lookup ran
+        change_feed.publish("created" if operation == "insert" else "updated", post_to_dict(change["fullDocument"]))
+
+async def watch_posts():
+    global change_stream_live
+    # The driver resumes by itself after a transient error; anything it
+    # gives up on ends every open stream (clients reload and reconnect)
+    # before the change stream is reopened
+    # The delete mark DELETE /posts/batch sets just before deleting isn't a change to publish
+    pipeline = [{"$match": {
+        "operationType": {"$in": ["insert", "update", "replace", "delete"]},
+        "updateDescription.updatedFields.delete_token": {"$exists": False},
+    }}]
+    delay = 1
+    while True:
+        try:
+            async with posts_collection.watch(pipeline, full_document="updateLookup") as stream:
+                change_stream_live = True
+                # Writes made while the stream was down were never seen
+                response_cache.clear()
+                delay = 1
+                async for change in stream:
+                    publish_change(change)
+        except OperationFailure as exc:
+            if exc.code == 40573:  # not a replica set
+                logger.warning("Change streams need MongoDB running as a replica set; GET /posts/stream is off")
+                return
+            logger.warning("Change stream on posts failed: %s", exc)
+        except PyMongoError as exc:
+            logger.warning("Change stream on posts failed: %s", exc)
+        finally:
+            change_stream_live = False
+            change_feed.close()
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 30)
+
+async def startup():
+    global ready, change_stream_task, insert_batcher
+    connect_database()
+    if RATE_LIMIT_BACKEND == "mongo":
+        rate_limiter.backend = MongoRateLimitBackend(database.rate_limits)
+        await rate_limiter.backend.ensure_indexes()
+    await prewarm_pool()
+    await ensure_indexes()
+    if CHECK_QUERY_PLANS:
+        await check_query_plans()
+    await rebuild_category_counts()
+    await rebuild_post_counts()
+    await load_word_indexes()
+    change_stream_task = asyncio.create_task(watch_posts())
+    change_feed.stop_on_signals()
+    if WRITE_BATCHING:
+        insert_batcher = PostInsertBatcher(WRITE_BATCH_MAX_DOCS, WRITE_BATCH_MAX_DELAY_MS / 1000, WRITE_BATCH_MAX_PENDING)
+        insert_batcher.start()
+    ready = True
+
+async def shutdown():
+    global client, ready, change_stream_task, insert_batcher
+    ready = False
+    if insert_batcher is not None:
+        # Before the client closes, so queued posts are still written
+        await insert_batcher.close()
+        insert_batcher = None
+    if change_stream_task is not None:
+        change_stream_task.cancel()
+        change_stream_task = None
+    change_feed.stop()
+    password_pool.shutdown()
+    if client is not None:
+        client.close()
+        client = None
+
+@app.exception_handler(WaitQueueTimeoutError)
+@app.exception_handler(ServerSelectionTimeoutError)
+async def database_unavailable(request: Request, exc: Exception):
+    # Pool exhausted or no server reachable: shed the request instead of a 500
+    return ORJSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Database is unavailable, please retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
 # Routes
 @app.get("/")
 async def root():
     return {"message": "Full-Stack Template API", "version": "1.0.0"}
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    # Prometheus text exposition format
+    content = metrics.render() + pool_monitor.render() + change_feed.render() + read_flights.render()
+    content += render_caches({"token": token_cache, "user": user_cache, "response": response_cache.entries})
+    if insert_batcher is not None:
+        content += insert_batcher.render()
+    return Response(content=content, media_type="text/plain; version=0.0.4")
+
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    # Liveness: the process is serving; no database call
+    return {"status": "ok", "pool": pool_monitor.stats()}
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    # Readiness: startup (pool pre-warm, indexes) has finished and the server answers
+    pool = pool_monitor.stats()
+    if not ready:
+        return ORJSONResponse(status_code=503, content={"status": "starting", "pool": pool})
+    try:
+        await client.admin.command("ping")
+    except (ServerSelectionTimeoutError, WaitQueueTimeoutError):
+        return ORJSONResponse(status_code=503, content={"status": "unavailable", "pool": pool_monitor.stats()})
+    return {"status": "ready", "pool": pool}
+
 @app.post("/auth/signup", response_model=Token)
-async def signup(user: UserCreate):
-    # Check if user already exists
-    existing_user = await users_collection.find_one({"$or": [{"username": user.username}, {"email": user.email}]})
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username or email already registered"
-        )
-    
-    # Create new user
-    hashed_password = get_password_hash(user.password)
+async def signup(user: UserCreate, request: Request):
+    await rate_limiter.enforce("signup", ip=client_ip(request), username=user.username)
+    # Create new user; the unique indexes on username and email reject duplicates
+    hashed_password = await password_pool.run(get_password_hash, user.password)
     user_doc = {
         "username": user.username,
         "email": user.email,
         "password": hashed_password,
-        "created_at": datetime.utcnow()
+        "created_at": datetime.utcnow(),
+        "post_count": 0
     }
     
-    result = await users_collection.insert_one(user_doc)
+    try:
+        await users_collection.insert_one(user_doc)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username or email already registered"
+        )
+    invalidate_user_cache(user.username)
     
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -160,10 +987,12 @@ async def signup(user: UserCreate):
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.post("/auth/login", response_model=Token)
-async def login(user: UserLogin):
+async def login(user: UserLogin, request: Request):
+    # Throttled before the bcrypt check so one client can't monopolise the hash pool
+    await rate_limiter.enforce("login", ip=client_ip(request), username=user.username)
     # Authenticate user
     db_user = await users_collection.find_one({"username": user.username})
-    if not db_user or not verify_password(user.password, db_user["password"]):
+    if not db_user or not await password_pool.run(verify_password, user.password, db_user["password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -184,28 +1013,152 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
         _id=str(current_user["_id"]),
         username=current_user["username"],
         email=current_user["email"],
-        created_at=current_user["created_at"]
+        created_at=current_user["created_at"],
+        post_count=current_user.get("post_count", 0)
     )
 
-@app.get("/posts", response_model=List[Post])
-async def get_posts(skip: int = 0, limit: int = 10):
-    cursor = posts_collection.find().sort("created_at", -1).skip(skip).limit(limit)
-    posts = []
-    async for post in cursor:
-        posts.append(Post(
-            _id=str(post["_id"]),
-            title=post["title"],
-            content=post["content"],
-            category=post["category"],
-            author_id=str(post["author_id"]),
-            author_username=post["author_username"],
-            created_at=post["created_at"],
-            updated_at=post["updated_at"]
-        ))
-    return posts
+@app.get("/suggest", response_model=List[Suggestion])
+async def get_suggestions(prefix: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=MAX_SUGGEST_LIMIT)):
+    # Dictionary words and post title terms starting with prefix, most frequent first
+    return ORJSONResponse(suggest(prefix, limit, word_index, title_terms))
+
+@app.get("/spell", response_model=List[SpellSuggestion])
+async def get_spelling_suggestions(
+    q: str = Query(..., min_length=1),
+    max_distance: int = Query(2, ge=0, le=2),
+    limit: int = Query(5, ge=1, le=MAX_SPELL_LIMIT),
+):
+    # Dictionary words and post vocabulary within max_distance edits of q
+    # (fewer for short words), closest first, then most frequent
+    return ORJSONResponse(spell(q, max_distance, limit, spell_index, post_vocabulary))
+
+@app.get("/posts", response_model=Union[List[Post], List[PostSummary]])
+async def get_posts(
+    request: Request,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    view: Literal["full", "summary"] = "full",
+    fields: Optional[str] = None,
+    excerpt: int = Query(0, ge=0, le=MAX_EXCERPT_LENGTH),
+    category: Optional[str] = None,
+):
+    # With a cursor, seek past the last seen (created_at, _id) instead of skipping
+    if cursor:
+        skip = 0
+    selected = resolve_fields(view, fields)
+    if excerpt and selected is None:
+        selected = POST_FIELDS
+    cache_key = (f"posts?skip={skip}&limit={limit}&cursor={cursor or ''}&fields={','.join(selected or ())}"
+                 f"&excerpt={excerpt}&category={category!r}")
+    entry = response_cache.get(cache_key)
+    if entry is not None:
+        return cached_response(request, entry)
+
+    query = {}
+    if category is not None:
+        query["category"] = category
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": last_id}},
+        ]
+
+    # Project only what the response needs; created_at and updated_at always
+    # come back because the next cursor and the ETag are built from them
+    projection = None
+    if selected is not None:
+        projection = {field: 1 for field in selected}
+        projection.update(created_at=1, updated_at=1)
+        if excerpt:
+            projection["excerpt"] = {"$substrCP": ["$content", 0, excerpt]}
+
+    async def load():
+        db_cursor = posts_collection.find(query, projection).sort([("created_at", -1), ("_id", -1)]).skip(skip).limit(limit)
+        posts = await db_cursor.to_list(length=None)
+        headers = {}
+        if limit > 0 and len(posts) == limit:
+            headers["X-Next-Cursor"] = encode_cursor(posts[-1]["created_at"], posts[-1]["_id"])
+        entry = cache_entry(orjson.dumps([post_to_dict(post, selected) for post in posts]), posts, headers)
+        tags = [str(post["_id"]) for post in posts]
+        if category is not None:
+            tags.append(category_tag(category))
+        return entry, tags, not cursor
+
+    return cached_response(request, await load_cached(cache_key, load))
+
+@app.get("/categories", response_model=List[CategoryCount])
+async def get_categories():
+    # Read from the counters, most used first; no pass over the posts
+    counts = await categories_collection.find({"count": {"$gt": 0}}).to_list(length=None)
+    counts.sort(key=lambda counter: (-counter["count"], str(counter["_id"])))
+    return ORJSONResponse([{"category": counter["_id"], "count": counter["count"]} for counter in counts])
+
+@app.get("/users/{user_id}/posts", response_model=Union[List[Post], List[PostSummary]])
+async def get_user_posts(
+    user_id: str,
+    request: Request,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    view: Literal["full", "summary"] = "full",
+    fields: Optional[str] = None,
+    excerpt: int = Query(0, ge=0, le=MAX_EXCERPT_LENGTH),
+):
+    # One author's posts, newest first, paged by cursor over the
+    # (author_id, created_at, _id) index. The first page carries the
+    # author's post_count as X-Total-Count.
+    selected = resolve_fields(view, fields)
+    if excerpt and selected is None:
+        selected = POST_FIELDS
+    cache_key = (f"users/{user_id}/posts?limit={limit}&cursor={cursor or ''}&fields={','.join(selected or ())}"
+                 f"&excerpt={excerpt}")
+    entry = response_cache.get(cache_key)
+    if entry is not None:
+        return cached_response(request, entry)
+
+    try:
+        author_id = ObjectId(user_id)
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid user ID")
+    query = {"author_id": author_id}
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": last_id}},
+        ]
+
+    projection = None
+    if selected is not None:
+        projection = {field: 1 for field in selected}
+        projection.update(created_at=1, updated_at=1)
+        if excerpt:
+            projection["excerpt"] = {"$substrCP": ["$content", 0, excerpt]}
+
+    async def load():
+        db_cursor = posts_collection.find(query, projection).sort([("created_at", -1), ("_id", -1)]).limit(limit)
+        headers = {}
+        if cursor:
+            posts = await db_cursor.to_list(length=None)
+        else:
+            posts, author = await asyncio.gather(
+                db_cursor.to_list(length=None),
+                users_collection.find_one({"_id": author_id}, {"post_count": 1}),
+            )
+            if author is None:
+                raise HTTPException(status_code=404, detail="User not found")
+            headers["X-Total-Count"] = str(author.get("post_count", 0))
+        if limit > 0 and len(posts) == limit:
+            headers["X-Next-Cursor"] = encode_cursor(posts[-1]["created_at"], posts[-1]["_id"])
+        entry = cache_entry(orjson.dumps([post_to_dict(post, selected) for post in posts]), posts, headers)
+        # Any write to the author's posts drops the first page, which holds the count
+        return entry, [str(post["_id"]) for post in posts], not cursor
+
+    return cached_response(request, await load_cached(cache_key, load))
 
 @app.post("/posts", response_model=Post)
-async def create_post(post: PostCreate, current_user: dict = Depends(get_current_user)):
+async def create_post(post: PostCreate, current_user: dict = Depends(get_rate_limited_writer)):
     post_doc = {
         "title": post.title,
         "content": post.content,
@@ -216,97 +1169,233 @@ async def create_post(post: PostCreate, current_user: dict = Depends(get_current
         "updated_at": datetime.utcnow()
     }
     
-    result = await posts_collection.insert_one(post_doc)
-    post_doc["_id"] = result.inserted_id
+    if insert_batcher is not None:
+        # The batch also updates the category and author counts
+        post_doc["_id"] = await insert_batcher.insert(post_doc)
+    else:
+        result = await posts_collection.insert_one(post_doc)
+        post_doc["_id"] = result.inserted_id
+        await asyncio.gather(
+            adjust_category_counts(Counter([post_doc["category"]])),
+            adjust_post_counts(Counter([author_key(post_doc)])),
+        )
+    index_post_text(post_doc)
+    response_cache.invalidate_offset_pages()
     
-    return Post(
-        _id=str(post_doc["_id"]),
-        title=post_doc["title"],
-        content=post_doc["content"],
-        category=post_doc["category"],
-        author_id=str(post_doc["author_id"]),
-        author_username=post_doc["author_username"],
-        created_at=post_doc["created_at"],
-        updated_at=post_doc["updated_at"]
+    return ORJSONResponse(post_to_dict(post_doc))
+
+@app.get("/posts/search", response_model=List[Post])
+async def search_posts(q: str, limit: int = 10):
+    cursor = posts_collection.find(
+        {"$text": {"$search": q}},
+        {"score": {"$meta": "textScore"}},
+    ).sort([("score", {"$meta": "textScore"})]).limit(limit)
+    return ORJSONResponse([post_to_dict(post) async for post in cursor])
+
+@app.get("/posts/export")
+async def export_posts(category: Optional[str] = None, author_id: Optional[str] = None, batch_size: int = EXPORT_BATCH_SIZE):
+    # Streams newline-delimited JSON straight off the Motor cursor, one batch
+    # at a time, so memory stays flat however many posts there are
+    query = {}
+    if category is not None:
+        query["category"] = category
+    if author_id is not None:
+        try:
+            query["author_id"] = ObjectId(author_id)
+        except (InvalidId, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid author ID")
+    batch_size = max(1, min(batch_size, 10000))
+
+    async def generate():
+        db_cursor = posts_collection.find(query).batch_size(batch_size)
+        lines = []
+        async for post in db_cursor:
+            lines.append(orjson.dumps(post_to_dict(post)))
+            if len(lines) >= batch_size:
+                yield b"\n".join(lines) + b"\n"
+                lines = []
+        if lines:
+            yield b"\n".join(lines) + b"\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@app.get("/posts/stream")
+async def stream_posts():
+    # Server-sent events: "created" and "updated" carry the post, "deleted"
+    # its _id, and "reset" means events were missed and the list should be
+    # reloaded before reconnecting
+    if not change_stream_live:
+        raise HTTPException(status_code=503, detail="Live updates need MongoDB running as a replica set")
+    return StreamingResponse(
+        change_feed.stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/posts/batch", response_model=List[BatchItemResult])
+async def create_posts_batch(posts: List[PostCreate], current_user: dict = Depends(get_rate_limited_writer)):
+    check_batch_size(posts, MAX_BATCH_SIZE)
+    now = datetime.utcnow()
+    post_docs = [{
+        "title": post.title,
+        "content": post.content,
+        "category": post.category,
+        "author_id": current_user["_id"],
+        "author_username": current_user["username"],
+        "created_at": now,
+        "updated_at": now
+    } for post in posts]
+
+    # insert_many sets _id on each document in place
+    await posts_collection.insert_many(post_docs)
+    for post_doc in post_docs:
+        index_post_text(post_doc)
+    await asyncio.gather(
+        adjust_category_counts(Counter(post_doc["category"] for post_doc in post_docs)),
+        adjust_post_counts(Counter({author_key(post_docs[0]): len(post_docs)})),
     )
+    response_cache.invalidate_offset_pages()
+
+    return ORJSONResponse([batch_result(str(post_doc["_id"]), 201, post=post_to_dict(post_doc)) for post_doc in post_docs])
+
+@app.patch("/posts/batch", response_model=List[BatchItemResult])
+async def update_posts_batch(updates: List[PostBatchUpdate], current_user: dict = Depends(get_rate_limited_writer)):
+    check_batch_size(updates, MAX_BATCH_SIZE)
+    parsed_ids = parse_object_ids([update.id for update in updates])
+    allowed, errors, previous_posts = await check_batch_authorship(parsed_ids, current_user)
+
+    now = datetime.utcnow()
+    operations = []
+    for update in updates:
+        if update.id in allowed:
+            update_data = {k: v for k, v in update.dict(exclude={"id"}).items() if v is not None}
+            update_data["updated_at"] = now
+            operations.append(UpdateOne({"_id": allowed[update.id]}, {"$set": update_data}))
+
+    updated = {}
+    if operations:
+        await posts_collection.bulk_write(operations, ordered=False)
+        for object_id in allowed.values():
+            response_cache.invalidate_post(str(object_id))
+        deltas = Counter()
+        async for post in posts_collection.find({"_id": {"$in": list(allowed.values())}}):
+            updated[str(post["_id"])] = post
+            previous = previous_posts[post["_id"]]
+            if post["category"] != previous["category"]:
+                deltas[previous["category"]] -= 1
+                deltas[post["category"]] += 1
+                response_cache.invalidate_post(category_tag(post["category"]))
+            index_post_text(post)
+        await adjust_category_counts(deltas)
+
+    results = []
+    for update in updates:
+        post = updated.get(update.id)
+        if post is None:
+            results.append(errors.get(update.id) or batch_result(update.id, 404, "Post not found"))
+            continue
+        results.append(batch_result(update.id, 200, post=post_to_dict(post)))
+    return ORJSONResponse(results)
+
+@app.delete("/posts/batch", response_model=List[BatchItemResult])
+async def delete_posts_batch(post_ids: List[str] = Body(...), current_user: dict = Depends(get_rate_limited_writer)):
+    check_batch_size(post_ids, MAX_BATCH_SIZE)
+    parsed_ids = parse_object_ids(post_ids)
+    allowed, errors, previous_posts = await check_batch_authorship(parsed_ids, current_user)
+
+    if allowed:
+        # Three round trips whatever the batch size: mark the posts with a
+        # token unique to this request, read the marked posts, delete them.
+        # Posts already marked by a concurrent delete are left to it, so
+        # each post is counted by exactly one request.
+        token = ObjectId()
+        await posts_collection.update_many(
+            {"_id": {"$in": list(allowed.values())}, "author_id": current_user["_id"], "delete_token": {"$exists": False}},
+            {"$set": {"delete_token": token}},
+        )
+        deleted_posts = await posts_collection.find({"delete_token": token}, {"category": 1}).to_list(None)
+        await posts_collection.delete_many({"delete_token": token})
+        deleted_ids = {post["_id"] for post in deleted_posts}
+        deltas = Counter()
+        for post in deleted_posts:
+            deltas[post["category"]] -= 1
+            unindex_post_text(str(post["_id"]))
+        for post_id, object_id in allowed.items():
+            if object_id not in deleted_ids:
+                errors[post_id] = batch_result(post_id, 404, "Post not found")
+        # Only the current user's own posts match the delete filter
+        author = (current_user["_id"], current_user["username"])
+        await asyncio.gather(adjust_category_counts(deltas), adjust_post_counts(Counter({author: -len(deleted_posts)})))
+        for object_id in allowed.values():
+            response_cache.invalidate_post(str(object_id))
+        response_cache.invalidate_offset_pages()
+
+    return ORJSONResponse([
+        errors[post_id] if post_id in errors else batch_result(post_id, 200, "Post deleted successfully")
+        for post_id in post_ids
+    ])
 
 @app.get("/posts/{post_id}", response_model=Post)
-async def get_post(post_id: str):
-    try:
-        post = await posts_collection.find_one({"_id": ObjectId(post_id)})
+async def get_post(post_id: str, request: Request):
+    cache_key = f"post:{post_id}"
+    entry = response_cache.get(cache_key)
+    if entry is not None:
+        return cached_response(request, entry)
+
+    object_id = parse_post_id(post_id)
+
+    async def load():
+        # A 404 is raised to every caller sharing the lookup
+        post = await posts_collection.find_one({"_id": object_id})
         if not post:
             raise HTTPException(status_code=404, detail="Post not found")
-        
-        return Post(
-            _id=str(post["_id"]),
-            title=post["title"],
-            content=post["content"],
-            category=post["category"],
-            author_id=str(post["author_id"]),
-            author_username=post["author_username"],
-            created_at=post["created_at"],
-            updated_at=post["updated_at"]
-        )
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid post ID")
+        return cache_entry(orjson.dumps(post_to_dict(post)), [post]), [str(post["_id"])], False
+
+    return cached_response(request, await load_cached(cache_key, load))
 
 @app.put("/posts/{post_id}", response_model=Post)
-async def update_post(post_id: str, post_update: PostUpdate, current_user: dict = Depends(get_current_user)):
-    try:
-        # Check if post exists and user is the author
-        post = await posts_collection.find_one({"_id": ObjectId(post_id)})
-        if not post:
-            raise HTTPException(status_code=404, detail="Post not found")
-        
-        if post["author_id"] != current_user["_id"]:
-            raise HTTPException(status_code=403, detail="Not authorized to update this post")
-        
-        # Update post
-        update_data = {k: v for k, v in post_update.dict().items() if v is not None}
-        update_data["updated_at"] = datetime.utcnow()
-        
-        await posts_collection.update_one(
-            {"_id": ObjectId(post_id)},
-            {"$set": update_data}
-        )
-        
-        # Get updated post
-        updated_post = await posts_collection.find_one({"_id": ObjectId(post_id)})
-        
-        return Post(
-            _id=str(updated_post["_id"]),
-            title=updated_post["title"],
-            content=updated_post["content"],
-            category=updated_post["category"],
-            author_id=str(updated_post["author_id"]),
-            author_username=updated_post["author_username"],
-            created_at=updated_post["created_at"],
-            updated_at=updated_post["updated_at"]
-        )
-    except Exception as e:
-        if "Invalid post ID" in str(e):
-            raise HTTPException(status_code=400, detail="Invalid post ID")
-        raise e
+async def update_post(post_id: str, post_update: PostUpdate, current_user: dict = Depends(get_rate_limited_writer)):
+    object_id = parse_post_id(post_id)
+    update_data = {k: v for k, v in post_update.dict().items() if v is not None}
+    update_data["updated_at"] = datetime.utcnow()
+
+    # Authorship is part of the filter, so check and write are one round trip.
+    # The pre-image gives the old category; the $set is applied to it locally.
+    previous_post = await posts_collection.find_one_and_update(
+        {"_id": object_id, "author_id": current_user["_id"]},
+        {"$set": update_data},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if previous_post is None:
+        await raise_missing_or_forbidden(object_id, "update")
+    updated_post = {**previous_post, **update_data}
+    index_post_text(updated_post)
+    if updated_post["category"] != previous_post["category"]:
+        await adjust_category_counts(Counter({previous_post["category"]: -1, updated_post["category"]: 1}))
+        response_cache.invalidate_post(category_tag(updated_post["category"]))
+    response_cache.invalidate_post(str(object_id))
+
+    return ORJSONResponse(post_to_dict(updated_post))
 
 @app.delete("/posts/{post_id}")
-async def delete_post(post_id: str, current_user: dict = Depends(get_current_user)):
-    try:
-        # Check if post exists and user is the author
-        post = await posts_collection.find_one({"_id": ObjectId(post_id)})
-        if not post:
-            raise HTTPException(status_code=404, detail="Post not found")
-        
-        if post["author_id"] != current_user["_id"]:
-            raise HTTPException(status_code=403, detail="Not authorized to delete this post")
-        
-        # Delete post
-        await posts_collection.delete_one({"_id": ObjectId(post_id)})
-        
-        return {"message": "Post deleted successfully"}
-    except Exception as e:
-        if "Invalid post ID" in str(e):
-            raise HTTPException(status_code=400, detail="Invalid post ID")
-        raise e
+async def delete_post(post_id: str, current_user: dict = Depends(get_rate_limited_writer)):
+    object_id = parse_post_id(post_id)
+
+    deleted_post = await posts_collection.find_one_and_delete(
+        {"_id": object_id, "author_id": current_user["_id"]},
+        projection={"category": 1},
+    )
+    if deleted_post is None:
+        await raise_missing_or_forbidden(object_id, "delete")
+    unindex_post_text(str(object_id))
+    await asyncio.gather(
+        adjust_category_counts(Counter({deleted_post["category"]: -1})),
+        adjust_post_counts(Counter({(current_user["_id"], current_user["username"]): -1})),
+    )
+    response_cache.invalidate_post(str(object_id))
+    response_cache.invalidate_offset_pages()
+
+    return {"message": "Post deleted successfully"}
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,18 +1,47 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Body, Query, Request, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Literal, Union
 from datetime import datetime, timedelta
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from itertools import islice
 import os
 from dotenv import load_dotenv
+from sortedcontainers import SortedList
+from spell import SpellIndex, TermSpellIndex, spell
+from suggest import TermTrie, WordIndex, suggest
+from common import (
+    CategoryCount, ChangeFeed, MemoryRateLimitBackend, Metrics, MetricsMiddleware, PasswordPool, PostBatchUpdate,
+    PostCreate, POST_FIELDS, PostUpdate, RateLimiter, ResponseCache, SpellSuggestion, Suggestion, Token, TTLCache,
+    UserCreate, UserLogin, batch_result, cache_entry, cached_response, category_tag, check_batch_size, client_ip,
+    encode_cursor, get_password_hash, post_serializer, rate_limits_from_env, render_caches, resolve_fields,
+    verify_password,
+)
+import asyncio
+from contextlib import asynccontextmanager
+import base64
+import heapq
+import json
+import logging
+import math
+import orjson
+import re
+import time
 import uuid
 
 load_dotenv()
 
-app = FastAPI(title="Full-Stack Template API (Test)", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # startup() and shutdown() live under "# Startup"
+    await startup()
+    try:
+        yield
+    finally:
+        await shutdown()
+
+app = FastAPI(title="Full-Stack Template API (Test)", version="1.0.0", default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -21,69 +50,418 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-Total-Count"],
 )
 
 # Security
 security = HTTPBearer()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # Configuration
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "test-secret-key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")  # "thread" or "process"
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "100"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1000"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30"))
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "100"))  # events a /posts/stream client may fall behind by
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+MAX_EXCERPT_LENGTH = 1000
+MAX_SUGGEST_LIMIT = 20
+WORDLIST_PATH = os.getenv("WORDLIST_PATH", "")  # word list, or an index built by `python suggest.py build`
+SPELL_INDEX_PATH = os.getenv("SPELL_INDEX_PATH", "")  # word list, or an index built by `python spell.py build`
+SPELL_MAX_POST_TERMS = int(os.getenv("SPELL_MAX_POST_TERMS", "50000"))
+MAX_SPELL_LIMIT = 20
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_MAX_BUCKETS = int(os.getenv("RATE_LIMIT_MAX_BUCKETS", "100000"))
+STORAGE_MODE = os.getenv("STORAGE_MODE", "memory")  # "memory", or "durable" to log writes to DATA_DIR
+DATA_DIR = os.getenv("DATA_DIR", "data")
+WAL_FSYNC_INTERVAL_MS = float(os.getenv("WAL_FSYNC_INTERVAL_MS", "5"))  # writes sharing one fsync
+WAL_SYNC_WRITES = os.getenv("WAL_SYNC_WRITES", "true").lower() == "true"  # false: reply before the fsync
+WAL_SNAPSHOT_RECORDS = int(os.getenv("WAL_SNAPSHOT_RECORDS", "100000"))  # log records between snapshots
 
-# In-memory storage for testing
-users_db = {}
-posts_db = {}
-
-# Pydantic models
-class UserCreate(BaseModel):
-    username: str
-    email: str
-    password: str
+logger = logging.getLogger(__name__)
 
-class UserLogin(BaseModel):
-    username: str
-    password: str
+# Metrics (request side only; there is no Mongo client to instrument here)
+metrics = Metrics()
+app.add_middleware(MetricsMiddleware, metrics=metrics)
 
+# Pydantic models
 class User(BaseModel):
     id: str
     username: str
     email: str
     created_at: datetime
+    post_count: int = 0
 
-class Token(BaseModel):
-    access_token: str
-    token_type: str
-
-class PostCreate(BaseModel):
+class Post(BaseModel):
+    id: str
     title: str
     content: str
-    category: Optional[str] = "general"
-
-class PostUpdate(BaseModel):
-    title: Optional[str] = None
-    content: Optional[str] = None
-    category: Optional[str] = None
+    category: str
+    author_id: str
+    author_username: str
+    created_at: datetime
+    updated_at: datetime
 
-class Post(BaseModel):
+class PostSummary(BaseModel):
+    # Slim list item for GET /posts?view=summary; content is replaced by an optional excerpt
     id: str
     title: str
-    content: str
     category: str
     author_id: str
     author_username: str
     created_at: datetime
     updated_at: datetime
+    excerpt: Optional[str] = None
+
+class BatchItemResult(BaseModel):
+    id: Optional[str] = None
+    status: int
+    detail: Optional[str] = None
+    post: Optional[Post] = None
+
+# Search
+class SearchIndex:
+    # Incrementally maintained inverted index with BM25 scoring. A query only
+    # touches the posting lists of its own terms, not every document.
+    TOKEN_RE = re.compile(r"[a-z0-9]+")
+    FIELD_WEIGHTS = {"title": 3, "content": 1}
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self.postings = {}  # term -> {doc_id: weighted term frequency}
+        self.doc_lengths = {}  # doc_id -> weighted token count
+        self.doc_terms = {}  # doc_id -> terms it is posted under, for removal
+        self.total_length = 0
+
+    @classmethod
+    def tokenize(cls, text: str):
+        return cls.TOKEN_RE.findall(text.lower())
+
+    def add(self, doc_id: str, fields: dict):
+        self.remove(doc_id)
+        frequencies = {}
+        length = 0
+        for field, weight in self.FIELD_WEIGHTS.items():
+            for term in self.tokenize(fields.get(field) or ""):
+                frequencies[term] = frequencies.get(term, 0) + weight
+                length += weight
+        for term, frequency in frequencies.items():
+            self.postings.setdefault(term, {})[doc_id] = frequency
+        self.doc_lengths[doc_id] = length
+        self.doc_terms[doc_id] = list(frequencies)
+        self.total_length += length
+
+    def remove(self, doc_id: str):
+        length = self.doc_lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self.total_length -= length
+        for term in self.doc_terms.pop(doc_id):
+            del self.postings[term][doc_id]
+            if not self.postings[term]:
+                del self.postings[term]
+
+    def search(self, query: str, limit: int = 10):
+        doc_count = len(self.doc_lengths)
+        if doc_count == 0:
+            return []
+        avg_length = self.total_length / doc_count or 1
+        scores = {}
+        for term in set(self.tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, frequency in docs.items():
+                norm = self.K1 * (1 - self.B + self.B * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.K1 + 1) / (frequency + norm)
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+# Storage
+class MemoryStore:
+    # Users and posts plus the secondary indexes the routes query by. Post
+    # listings walk (created_at, _id) keys held in SortedLists, so a page costs
+    # O(log n + limit) whether it is the first page or the ten-thousandth.
+    def __init__(self):
+        self.users = {}  # username -> user
+        self.users_by_email = {}
+        self.users_by_id = {}
+        self.posts = {}  # _id -> post
+        self.posts_by_created = SortedList()
+        self.posts_by_author = {}  # author_id -> SortedList of (created_at, _id)
+        self.posts_by_category = {}  # category -> SortedList of (created_at, _id)
+        self.search = SearchIndex()
+        self.titles = TermTrie(MAX_SUGGEST_LIMIT)  # title terms for /suggest
+        self.vocabulary = TermSpellIndex(SPELL_MAX_POST_TERMS)  # title and content terms for /spell
+
+    # Users
+    def get_user(self, username: str):
+        return self.users.get(username)
+
+    def get_user_by_email(self, email: str):
+        return self.users_by_email.get(email)
+
+    def get_user_by_id(self, user_id: str):
+        return self.users_by_id.get(user_id)
+
+    def insert_user(self, user: dict) -> bool:
+        if user["username"] in self.users or user["email"] in self.users_by_email:
+            return False
+        self.users[user["username"]] = user
+        self.users_by_email[user["email"]] = user
+        self.users_by_id[user["_id"]] = user
+        return True
+
+    # Posts
+    def get_post(self, post_id: str):
+        return self.posts.get(post_id)
+
+    def insert_post(self, post: dict):
+        key = (post["created_at"], post["_id"])
+        self.posts[post["_id"]] = post
+        self.posts_by_created.add(key)
+        self.posts_by_author.setdefault(post["author_id"], SortedList()).add(key)
+        self.posts_by_category.setdefault(post["category"], SortedList()).add(key)
+        self.search.add(post["_id"], post)
+        self.titles.add(post["title"])
+        self.vocabulary.add(f"{post['title']} {post['content']}")
+
+    def update_post(self, post_id: str, changes: dict):
+        post = self.posts[post_id]
+        key = (post["created_at"], post_id)
+        if "category" in changes and changes["category"] != post["category"]:
+            self._discard(self.posts_by_category, post["category"], key)
+            self.posts_by_category.setdefault(changes["category"], SortedList()).add(key)
+        if "title" in changes and changes["title"] != post["title"]:
+            self.titles.remove(post["title"])
+            self.titles.add(changes["title"])
+        if "title" in changes or "content" in changes:
+            self.vocabulary.remove(f"{post['title']} {post['content']}")
+        post.update(changes)
+        if "title" in changes or "content" in changes:
+            self.search.add(post_id, post)
+            self.vocabulary.add(f"{post['title']} {post['content']}")
+        return post
+
+    def insert_posts(self, posts: List[dict]):
+        # Batched insert: each SortedList absorbs its new keys in one update()
+        by_author, by_category = {}, {}
+        for post in posts:
+            key = (post["created_at"], post["_id"])
+            self.posts[post["_id"]] = post
+            by_author.setdefault(post["author_id"], []).append(key)
+            by_category.setdefault(post["category"], []).append(key)
+            self.search.add(post["_id"], post)
+            self.titles.add(post["title"])
+            self.vocabulary.add(f"{post['title']} {post['content']}")
+        self.posts_by_created.update((post["created_at"], post["_id"]) for post in posts)
+        for author_id, keys in by_author.items():
+            self.posts_by_author.setdefault(author_id, SortedList()).update(keys)
+        for category, keys in by_category.items():
+            self.posts_by_category.setdefault(category, SortedList()).update(keys)
+
+    def update_posts(self, changes_by_id: dict):
+        return {post_id: self.update_post(post_id, changes) for post_id, changes in changes_by_id.items()}
+
+    def delete_posts(self, post_ids: List[str]):
+        return {post_id: self.delete_post(post_id) for post_id in post_ids}
+
+    def delete_post(self, post_id: str):
+        post = self.posts.pop(post_id, None)
+        if post is None:
+            return None
+        key = (post["created_at"], post_id)
+        self.posts_by_created.remove(key)
+        self._discard(self.posts_by_author, post["author_id"], key)
+        self._discard(self.posts_by_category, post["category"], key)
+        self.search.remove(post_id)
+        self.titles.remove(post["title"])
+        self.vocabulary.remove(f"{post['title']} {post['content']}")
+        return post
+
+    def list_posts(self, skip: int = 0, limit: int = 10, after: Optional[tuple] = None,
+                   author_id: Optional[str] = None, category: Optional[str] = None):
+        # Newest first; `after` is the (created_at, _id) key of the last post already seen
+        if author_id is not None:
+            keys = self.posts_by_author.get(author_id, SortedList())
+        elif category is not None:
+            keys = self.posts_by_category.get(category, SortedList())
+        else:
+            keys = self.posts_by_created
+        if author_id is not None and category is not None:
+            # No combined index; filter the author's list by category
+            matches = (key for key in self._walk(keys, 0, after) if self.posts[key[1]]["category"] == category)
+            page = islice(matches, skip, skip + max(limit, 0))
+        else:
+            page = islice(self._walk(keys, skip, after), max(limit, 0))
+        return [self.posts[post_id] for _, post_id in page]
+
+    def post_count(self, author_id: str) -> int:
+        # Like category_counts, read off the index every write keeps current
+        return len(self.posts_by_author.get(author_id, ()))
+
+    def category_counts(self):
+        # posts_by_category is kept current by every write, so its sizes are the counts
+        return {category: len(keys) for category, keys in self.posts_by_category.items()}
+
+    def search_posts(self, query: str, limit: int = 10):
+        return [self.posts[post_id] for post_id, _ in self.search.search(query, limit)]
+
+    @staticmethod
+    def _walk(keys: SortedList, skip: int, after: Optional[tuple]):
+        if after is not None:
+            return keys.irange(maximum=after, inclusive=(True, False), reverse=True)
+        return keys.islice(0, max(len(keys) - skip, 0), reverse=True)
+
+    @staticmethod
+    def _discard(index: dict, value, key: tuple):
+        keys = index.get(value)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del index[value]
+
+    # Lifecycle; nothing to load or flush for a purely in-memory store
+    async def open(self):
+        pass
+
+    async def sync(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def render(self) -> str:
+        return ""
+
+class DurableStore(MemoryStore):
+    # MemoryStore plus a write-ahead log: every mutation is appended as a
+    # record and replayed into a fresh MemoryStore on boot, so reads stay
+    # dict lookups and only writes pay for durability. Routes call sync()
+    # after writing, which waits for the group fsync covering the write.
+    DATETIME_FIELDS = ("created_at", "updated_at")
+
+    def __init__(self, directory: str):
+        super().__init__()
+        from wal import WriteAheadLog
+        self.log = WriteAheadLog(directory, WAL_FSYNC_INTERVAL_MS / 1000, WAL_SNAPSHOT_RECORDS, self.snapshot_records)
+
+    def insert_user(self, user: dict) -> bool:
+        created = super().insert_user(user)
+        if created:
+            self.log.append({"op": "insert_user", "user": user})
+        return created
+
+    def insert_post(self, post: dict):
+        super().insert_post(post)
+        self.log.append({"op": "insert_posts", "posts": [post]})
+
+    def update_post(self, post_id: str, changes: dict):
+        post = super().update_post(post_id, changes)
+        self.log.append({"op": "update_post", "id": post_id, "changes": changes})
+        return post
+
+    def insert_posts(self, posts: List[dict]):
+        super().insert_posts(posts)
+        self.log.append({"op": "insert_posts", "posts": posts})
+
+    def delete_post(self, post_id: str):
+        post = super().delete_post(post_id)
+        if post is not None:
+            self.log.append({"op": "delete_post", "id": post_id})
+        return post
+
+    async def open(self):
+        # Replay runs before the app serves anything, so a thread may build the store
+        started = time.perf_counter()
+        records = await asyncio.to_thread(self.replay)
+        self.log.start()
+        logger.info("Replayed %d records from %s in %.2fs", records, self.log.directory, time.perf_counter() - started)
+
+    async def sync(self):
+        if WAL_SYNC_WRITES:
+            await self.log.sync()
+
+    async def close(self):
+        await self.log.close()
+
+    def render(self) -> str:
+        return self.log.render()
+
+    def replay(self) -> int:
+        # Applied through MemoryStore's methods so nothing is logged again
+        count = 0
+        for record in self.log.replay():
+            op = record["op"]
+            if op == "insert_user":
+                MemoryStore.insert_user(self, self.parse_datetimes(record["user"]))
+            elif op == "insert_posts":
+                MemoryStore.insert_posts(self, [self.parse_datetimes(post) for post in record["posts"]])
+            elif op == "update_post":
+                MemoryStore.update_post(self, record["id"], self.parse_datetimes(record["changes"]))
+            elif op == "delete_post":
+                MemoryStore.delete_post(self, record["id"])
+            count += 1
+        return count
+
+    def snapshot_records(self):
+        # The smallest log that rebuilds the current state
+        for user in self.users.values():
+            yield {"op": "insert_user", "user": user}
+        posts = iter(self.posts.values())
+        while chunk := list(islice(posts, 1000)):
+            yield {"op": "insert_posts", "posts": chunk}
+
+    @classmethod
+    def parse_datetimes(cls, doc: dict) -> dict:
+        # orjson writes datetimes as ISO 8601 strings
+        for field in cls.DATETIME_FIELDS:
+            if isinstance(doc.get(field), str):
+                doc[field] = datetime.fromisoformat(doc[field])
+        return doc
+
+# In-memory storage, optionally made durable by a write-ahead log
+store = DurableStore(DATA_DIR) if STORAGE_MODE == "durable" else MemoryStore()
+ready = False
+
+# Rate limiting and password hashing
+rate_limiter = RateLimiter(MemoryRateLimitBackend(RATE_LIMIT_MAX_BUCKETS), rate_limits_from_env(), RATE_LIMIT_ENABLED)
+password_pool = PasswordPool(PASSWORD_HASH_EXECUTOR, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
 
 # Helper functions
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(data["t"]), str(data["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+def check_batch_authorship(post_ids: List[str], current_user: dict):
+    # Returns the ids the user may modify and error results for the rest
+    allowed, errors = [], {}
+    for post_id in post_ids:
+        post = store.get_post(post_id)
+        if not post:
+            errors[post_id] = batch_result(post_id, 404, "Post not found")
+        elif post["author_id"] != current_user["_id"]:
+            errors[post_id] = batch_result(post_id, 403, "Not authorized to modify this post")
+        else:
+            allowed.append(post_id)
+    return allowed, errors
+
+post_to_dict = post_serializer("id")
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    from jose import jwt
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -93,39 +471,54 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# Decoded tokens (token -> username); store lookups are already O(1)
+token_cache = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL_SECONDS)
+
+# Dictionary word lists for /suggest and /spell, loaded at startup
+word_index: Optional[WordIndex] = None
+spell_index: Optional[SpellIndex] = None
+
+# Serialized GET /posts and GET /posts/{post_id} responses
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_SECONDS)
+
+# GET /posts/stream subscribers; the write routes publish to it directly
+change_feed = ChangeFeed(SSE_QUEUE_SIZE, SSE_HEARTBEAT_SECONDS)
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        token = credentials.credentials
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+    token = credentials.credentials
+    username = token_cache.get(token)
+    if username is None:
+        from jose import JWTError, jwt
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            username: str = payload.get("sub")
+            if username is None:
+                raise credentials_exception
+        except JWTError:
             raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    user = users_db.get(username)
+        # Never keep a token cached past its own expiry
+        token_cache.set(token, username, ttl=payload.get("exp", 0) - time.time())
+
+    user = store.get_user(username)
     if user is None:
         raise credentials_exception
     return user
 
-# Initialize with demo user
-demo_user_id = str(uuid.uuid4())
-demo_password_hash = get_password_hash("demo123")
-users_db["demo"] = {
-    "_id": demo_user_id,
-    "username": "demo",
-    "email": "demo@example.com",
-    "password": demo_password_hash,
-    "created_at": datetime.utcnow()
-}
-
-# Initialize with demo posts
-demo_posts = [
+async def get_rate_limited_writer(current_user: dict = Depends(get_current_user)):
+    # get_current_user for post writes, with the per-user write limit applied
+    await rate_limiter.enforce("post_write", user=current_user["_id"])
+    return current_user
+
+# Demo data, seeded by startup()
+DEMO_USERNAME = "demo"
+# bcrypt of "demo123", precomputed so startup doesn't spend ~300ms hashing it
+DEMO_PASSWORD_HASH = "$2b$12$unRN96L2q6RjkePU93qrlu7Fu.D6zRVQb8FZsSwYWAhW3jTTe09Ye"
+DEMO_POSTS = [
     {
         "title": "Welcome to FullStack Template",
         "content": "This is a demo post to showcase the CRUD functionality of our full-stack application. You can create, read, update, and delete posts through the admin dashboard.",
@@ -143,43 +536,101 @@ demo_posts = [
     }
 ]
 
-for i, post_data in enumerate(demo_posts):
-    post_id = str(uuid.uuid4())
-    posts_db[post_id] = {
-        "_id": post_id,
-        "title": post_data["title"],
-        "content": post_data["content"],
-        "category": post_data["category"],
-        "author_id": demo_user_id,
-        "author_username": "demo",
-        "created_at": datetime.utcnow() - timedelta(days=i),
-        "updated_at": datetime.utcnow() - timedelta(days=i)
-    }
+# Startup
+def seed_demo_data():
+    # Idempotent, so a second lifespan in the same process (tests) adds nothing
+    if store.get_user(DEMO_USERNAME) is not None:
+        return
+    demo_user_id = str(uuid.uuid4())
+    store.insert_user({
+        "_id": demo_user_id,
+        "username": DEMO_USERNAME,
+        "email": "demo@example.com",
+        "password": DEMO_PASSWORD_HASH,
+        "created_at": datetime.utcnow()
+    })
+    for i, post_data in enumerate(DEMO_POSTS):
+        store.insert_post({
+            "_id": str(uuid.uuid4()),
+            "title": post_data["title"],
+            "content": post_data["content"],
+            "category": post_data["category"],
+            "author_id": demo_user_id,
+            "author_username": DEMO_USERNAME,
+            "created_at": datetime.utcnow() - timedelta(days=i),
+            "updated_at": datetime.utcnow() - timedelta(days=i)
+        })
+
+async def load_word_indexes():
+    global word_index, spell_index
+    if WORDLIST_PATH:
+        word_index = await asyncio.to_thread(WordIndex.open, WORDLIST_PATH)
+    if SPELL_INDEX_PATH:
+        spell_index = store.vocabulary.known = await asyncio.to_thread(SpellIndex.open, SPELL_INDEX_PATH)
+
+async def startup():
+    global ready
+    await store.open()
+    seed_demo_data()
+    await load_word_indexes()
+    change_feed.stop_on_signals()
+    ready = True
+
+async def shutdown():
+    global ready
+    ready = False
+    change_feed.stop()
+    password_pool.shutdown()
+    await store.close()
 
 # Routes
 @app.get("/")
 async def root():
     return {"message": "Full-Stack Template API (Test Mode)", "version": "1.0.0"}
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    # Prometheus text exposition format
+    content = metrics.render() + change_feed.render() + store.render() + render_caches({"token": token_cache, "response": response_cache.entries})
+    return Response(content=content, media_type="text/plain; version=0.0.4")
+
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    # Ready once startup has seeded the store and loaded the word lists
+    if not ready:
+        return ORJSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready"}
+
 @app.post("/auth/signup", response_model=Token)
-async def signup(user: UserCreate):
+async def signup(user: UserCreate, request: Request):
+    await rate_limiter.enforce("signup", ip=client_ip(request), username=user.username)
     # Check if user already exists
-    if user.username in users_db or any(u["email"] == user.email for u in users_db.values()):
+    if store.get_user(user.username) or store.get_user_by_email(user.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username or email already registered"
         )
     
-    # Create new user
+    # Create new user; insert_user re-checks in case another signup won while we were hashing
     user_id = str(uuid.uuid4())
-    hashed_password = get_password_hash(user.password)
-    users_db[user.username] = {
+    hashed_password = await password_pool.run(get_password_hash, user.password)
+    created = store.insert_user({
         "_id": user_id,
         "username": user.username,
         "email": user.email,
         "password": hashed_password,
         "created_at": datetime.utcnow()
-    }
+    })
+    if not created:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username or email already registered"
+        )
+    await store.sync()
     
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -190,10 +641,12 @@ async def signup(user: UserCreate):
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.post("/auth/login", response_model=Token)
-async def login(user: UserLogin):
+async def login(user: UserLogin, request: Request):
+    # Throttled before the bcrypt check so one client can't monopolise the hash pool
+    await rate_limiter.enforce("login", ip=client_ip(request), username=user.username)
     # Authenticate user
-    db_user = users_db.get(user.username)
-    if not db_user or not verify_password(user.password, db_user["password"]):
+    db_user = store.get_user(user.username)
+    if not db_user or not await password_pool.run(verify_password, user.password, db_user["password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -214,28 +667,111 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
         id=str(current_user["_id"]),
         username=current_user["username"],
         email=current_user["email"],
-        created_at=current_user["created_at"]
+        created_at=current_user["created_at"],
+        post_count=store.post_count(current_user["_id"])
     )
 
-@app.get("/posts", response_model=List[Post])
-async def get_posts(skip: int = 0, limit: int = 10):
-    posts_list = list(posts_db.values())
-    posts_list.sort(key=lambda x: x["created_at"], reverse=True)
-    posts_slice = posts_list[skip:skip + limit]
-    
-    return [Post(
-        id=str(post["_id"]),
-        title=post["title"],
-        content=post["content"],
-        category=post["category"],
-        author_id=str(post["author_id"]),
-        author_username=post["author_username"],
-        created_at=post["created_at"],
-        updated_at=post["updated_at"]
-    ) for post in posts_slice]
+@app.get("/suggest", response_model=List[Suggestion])
+async def get_suggestions(prefix: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=MAX_SUGGEST_LIMIT)):
+    # Dictionary words and post title terms starting with prefix, most frequent first
+    return ORJSONResponse(suggest(prefix, limit, word_index, store.titles))
+
+@app.get("/spell", response_model=List[SpellSuggestion])
+async def get_spelling_suggestions(
+    q: str = Query(..., min_length=1),
+    max_distance: int = Query(2, ge=0, le=2),
+    limit: int = Query(5, ge=1, le=MAX_SPELL_LIMIT),
+):
+    # Dictionary words and post vocabulary within max_distance edits of q
+    # (fewer for short words), closest first, then most frequent
+    return ORJSONResponse(spell(q, max_distance, limit, spell_index, store.vocabulary))
+
+@app.get("/posts", response_model=Union[List[Post], List[PostSummary]])
+async def get_posts(
+    request: Request,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    view: Literal["full", "summary"] = "full",
+    fields: Optional[str] = None,
+    excerpt: int = Query(0, ge=0, le=MAX_EXCERPT_LENGTH),
+    category: Optional[str] = None,
+):
+    # A cursor seeks straight past the last seen (created_at, _id) key
+    if cursor:
+        skip = 0
+    selected = resolve_fields(view, fields)
+    if excerpt and selected is None:
+        selected = POST_FIELDS
+    cache_key = (f"posts?skip={skip}&limit={limit}&cursor={cursor or ''}&fields={','.join(selected or ())}"
+                 f"&excerpt={excerpt}&category={category!r}")
+    entry = response_cache.get(cache_key)
+    if entry is not None:
+        return cached_response(request, entry)
+
+    after = decode_cursor(cursor) if cursor else None
+    posts_slice = store.list_posts(skip=skip, limit=limit, after=after, category=category)
+    if excerpt:
+        posts_slice = [{**post, "excerpt": post["content"][:excerpt]} for post in posts_slice]
+
+    headers = {}
+    if limit > 0 and len(posts_slice) == limit:
+        last = posts_slice[-1]
+        headers["X-Next-Cursor"] = encode_cursor(last["created_at"], last["_id"])
+
+    entry = cache_entry(orjson.dumps([post_to_dict(post, selected) for post in posts_slice]), posts_slice, headers)
+    tags = [post["_id"] for post in posts_slice]
+    if category is not None:
+        tags.append(category_tag(category))
+    response_cache.set(cache_key, entry, tags, offset_page=not cursor)
+    return cached_response(request, entry)
+
+@app.get("/users/{user_id}/posts", response_model=Union[List[Post], List[PostSummary]])
+async def get_user_posts(
+    user_id: str,
+    request: Request,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    view: Literal["full", "summary"] = "full",
+    fields: Optional[str] = None,
+    excerpt: int = Query(0, ge=0, le=MAX_EXCERPT_LENGTH),
+):
+    # One author's posts, newest first, paged by cursor; the first page
+    # carries the author's post count as X-Total-Count
+    selected = resolve_fields(view, fields)
+    if excerpt and selected is None:
+        selected = POST_FIELDS
+    cache_key = (f"users/{user_id}/posts?limit={limit}&cursor={cursor or ''}&fields={','.join(selected or ())}"
+                 f"&excerpt={excerpt}")
+    entry = response_cache.get(cache_key)
+    if entry is not None:
+        return cached_response(request, entry)
+
+    if store.get_user_by_id(user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    after = decode_cursor(cursor) if cursor else None
+    posts_slice = store.list_posts(limit=limit, after=after, author_id=user_id)
+    if excerpt:
+        posts_slice = [{**post, "excerpt": post["content"][:excerpt]} for post in posts_slice]
+
+    headers = {}
+    if not cursor:
+        headers["X-Total-Count"] = str(store.post_count(user_id))
+    if limit > 0 and len(posts_slice) == limit:
+        last = posts_slice[-1]
+        headers["X-Next-Cursor"] = encode_cursor(last["created_at"], last["_id"])
+
+    entry = cache_entry(orjson.dumps([post_to_dict(post, selected) for post in posts_slice]), posts_slice, headers)
+    response_cache.set(cache_key, entry, [post["_id"] for post in posts_slice], offset_page=not cursor)
+    return cached_response(request, entry)
+
+@app.get("/categories", response_model=List[CategoryCount])
+async def get_categories():
+    counts = sorted(store.category_counts().items(), key=lambda item: (-item[1], str(item[0])))
+    return ORJSONResponse([{"category": category, "count": count} for category, count in counts])
 
 @app.post("/posts", response_model=Post)
-async def create_post(post: PostCreate, current_user: dict = Depends(get_current_user)):
+async def create_post(post: PostCreate, current_user: dict = Depends(get_rate_limited_writer)):
     post_id = str(uuid.uuid4())
     post_doc = {
         "_id": post_id,
@@ -248,39 +784,137 @@ async def create_post(post: PostCreate, current_user: dict = Depends(get_current
         "updated_at": datetime.utcnow()
     }
     
-    posts_db[post_id] = post_doc
+    store.insert_post(post_doc)
+    await store.sync()
+    response_cache.invalidate_offset_pages()
+    post = post_to_dict(post_doc)
+    change_feed.publish("created", post)
     
-    return Post(
-        id=str(post_doc["_id"]),
-        title=post_doc["title"],
-        content=post_doc["content"],
-        category=post_doc["category"],
-        author_id=str(post_doc["author_id"]),
-        author_username=post_doc["author_username"],
-        created_at=post_doc["created_at"],
-        updated_at=post_doc["updated_at"]
+    return ORJSONResponse(post)
+
+@app.get("/posts/search", response_model=List[Post])
+async def search_posts(q: str, limit: int = 10):
+    return ORJSONResponse([post_to_dict(post) for post in store.search_posts(q, limit)])
+
+@app.get("/posts/export")
+async def export_posts(category: Optional[str] = None, author_id: Optional[str] = None, batch_size: int = EXPORT_BATCH_SIZE):
+    # Streams newline-delimited JSON in keyset-paged batches, so memory stays
+    # flat and concurrent writes never invalidate an iterator mid-export
+    batch_size = max(1, min(batch_size, 10000))
+
+    async def generate():
+        after = None
+        while True:
+            batch = store.list_posts(limit=batch_size, after=after, author_id=author_id, category=category)
+            if not batch:
+                break
+            yield b"\n".join(orjson.dumps(post_to_dict(post)) for post in batch) + b"\n"
+            after = (batch[-1]["created_at"], batch[-1]["_id"])
+            # Let other requests run between batches
+            await asyncio.sleep(0)
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@app.get("/posts/stream")
+async def stream_posts():
+    # Server-sent events: "created" and "updated" carry the post, "deleted"
+    # its id, and "reset" means events were missed and the list should be
+    # reloaded before reconnecting
+    return StreamingResponse(
+        change_feed.stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
+@app.post("/posts/batch", response_model=List[BatchItemResult])
+async def create_posts_batch(posts: List[PostCreate], current_user: dict = Depends(get_rate_limited_writer)):
+    check_batch_size(posts, MAX_BATCH_SIZE)
+    now = datetime.utcnow()
+    post_docs = [{
+        "_id": str(uuid.uuid4()),
+        "title": post.title,
+        "content": post.content,
+        "category": post.category,
+        "author_id": current_user["_id"],
+        "author_username": current_user["username"],
+        "created_at": now,
+        "updated_at": now
+    } for post in posts]
+
+    store.insert_posts(post_docs)
+    await store.sync()
+    response_cache.invalidate_offset_pages()
+    posts = [post_to_dict(post_doc) for post_doc in post_docs]
+    for post in posts:
+        change_feed.publish("created", post)
+
+    return ORJSONResponse([batch_result(post["id"], 201, post=post) for post in posts])
+
+@app.patch("/posts/batch", response_model=List[BatchItemResult])
+async def update_posts_batch(updates: List[PostBatchUpdate], current_user: dict = Depends(get_rate_limited_writer)):
+    check_batch_size(updates, MAX_BATCH_SIZE)
+    allowed, errors = check_batch_authorship([update.id for update in updates], current_user)
+
+    now = datetime.utcnow()
+    changes_by_id = {}
+    for update in updates:
+        if update.id in allowed:
+            update_data = {k: v for k, v in update.dict(exclude={"id"}).items() if v is not None}
+            update_data["updated_at"] = now
+            changes_by_id.setdefault(update.id, {}).update(update_data)
+    previous_categories = {post_id: store.get_post(post_id)["category"] for post_id in changes_by_id}
+    updated = store.update_posts(changes_by_id)
+    await store.sync()
+    for post_id, post in updated.items():
+        response_cache.invalidate_post(post_id)
+        if post["category"] != previous_categories[post_id]:
+            response_cache.invalidate_post(category_tag(post["category"]))
+        change_feed.publish("updated", post_to_dict(post))
+
+    results = []
+    for update in updates:
+        post = updated.get(update.id)
+        if post is None:
+            results.append(errors[update.id])
+            continue
+        results.append(batch_result(update.id, 200, post=post_to_dict(post)))
+    return ORJSONResponse(results)
+
+@app.delete("/posts/batch", response_model=List[BatchItemResult])
+async def delete_posts_batch(post_ids: List[str] = Body(...), current_user: dict = Depends(get_rate_limited_writer)):
+    check_batch_size(post_ids, MAX_BATCH_SIZE)
+    allowed, errors = check_batch_authorship(post_ids, current_user)
+
+    store.delete_posts(allowed)
+    await store.sync()
+    for post_id in allowed:
+        response_cache.invalidate_post(post_id)
+        change_feed.publish("deleted", {"id": post_id})
+    response_cache.invalidate_offset_pages()
+
+    return ORJSONResponse([
+        errors[post_id] if post_id in errors else batch_result(post_id, 200, "Post deleted successfully")
+        for post_id in post_ids
+    ])
+
 @app.get("/posts/{post_id}", response_model=Post)
-async def get_post(post_id: str):
-    post = posts_db.get(post_id)
+async def get_post(post_id: str, request: Request):
+    cache_key = f"post:{post_id}"
+    entry = response_cache.get(cache_key)
+    if entry is not None:
+        return cached_response(request, entry)
+
+    post = store.get_post(post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
-    return Post(
-        id=str(post["_id"]),
-        title=post["title"],
-        content=post["content"],
-        category=post["category"],
-        author_id=str(post["author_id"]),
-        author_username=post["author_username"],
-        created_at=post["created_at"],
-        updated_at=post["updated_at"]
-    )
+    entry = cache_entry(orjson.dumps(post_to_dict(post)), [post])
+    response_cache.set(cache_key, entry, [post_id])
+    return cached_response(request, entry)
 
 @app.put("/posts/{post_id}", response_model=Post)
-async def update_post(post_id: str, post_update: PostUpdate, current_user: dict = Depends(get_current_user)):
-    post = posts_db.get(post_id)
+async def update_post(post_id: str, post_update: PostUpdate, current_user: dict = Depends(get_rate_limited_writer)):
+    post = store.get_post(post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
@@ -289,23 +923,21 @@ async def update_post(post_id: str, post_update: PostUpdate, current_user: dict
     
     # Update post
     update_data = {k: v for k, v in post_update.dict().items() if v is not None}
-    post.update(update_data)
-    post["updated_at"] = datetime.utcnow()
+    update_data["updated_at"] = datetime.utcnow()
+    previous_category = post["category"]
+    post = store.update_post(post_id, update_data)
+    await store.sync()
+    response_cache.invalidate_post(post_id)
+    if post["category"] != previous_category:
+        response_cache.invalidate_post(category_tag(post["category"]))
+    post = post_to_dict(post)
+    change_feed.publish("updated", post)
     
-    return Post(
-        id=str(post["_id"]),
-        title=post["title"],
-        content=post["content"],
-        category=post["category"],
-        author_id=str(post["author_id"]),
-        author_username=post["author_username"],
-        created_at=post["created_at"],
-        updated_at=post["updated_at"]
-    )
+    return ORJSONResponse(post)
 
 @app.delete("/posts/{post_id}")
-async def delete_post(post_id: str, current_user: dict = Depends(get_current_user)):
-    post = posts_db.get(post_id)
+async def delete_post(post_id: str, current_user: dict = Depends(get_rate_limited_writer)):
+    post = store.get_post(post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
@@ -313,7 +945,11 @@ async def delete_post(post_id: str, current_user: dict = Depends(get_current_use
         raise HTTPException(status_code=403, detail="Not authorized to delete this post")
     
     # Delete post
-    del posts_db[post_id]
+    store.delete_post(post_id)
+    await store.sync()
+    response_cache.invalidate_post(post_id)
+    response_cache.invalidate_offset_pages()
+    change_feed.publish("deleted", {"id": post_id})
     
     return {"message": "Post deleted successfully"}
 
@@ -0,0 +1,229 @@
+"""Spelling suggestions ("did you mean") using symmetric-delete (SymSpell) lookup.
+
+Every dictionary word is indexed under the strings left after deleting up
+to MAX_DISTANCE characters from its first PREFIX_LENGTH characters; a query
+generates the same deletes from its own prefix, and any word sharing one is
+a candidate, confirmed with a real edit distance. For the word list the
+delete keys are stored as 40-bit hashes packed with the word's position
+into one sorted array of 64-bit integers, so the compiled index is flat,
+memory-mappable and a fraction of the size of a delete -> words dict.
+Hash collisions only add candidates, which the distance check drops.
+
+Post vocabulary changes with every write and is held in a small in-memory
+delete map instead, capped at a fixed number of terms.
+
+    cd backend
+    python spell.py build words.txt words.spell
+"""
+import bisect
+import hashlib
+import mmap
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from suggest import read_word_list, tokenize
+
+MAX_DISTANCE = 2
+PREFIX_LENGTH = 7
+MAGIC = b"SPELLIX1"
+HEADER = struct.Struct("<8sIIIII")  # magic, word count, blob length, entries, max distance, prefix length
+POSITION_BITS = 24  # up to 16M words
+POSITION_MASK = (1 << POSITION_BITS) - 1
+
+def deletes(term: str, max_distance: int = MAX_DISTANCE, prefix_length: int = PREFIX_LENGTH) -> Set[str]:
+    term = term[:prefix_length]
+    results, frontier = {term}, {term}
+    for _ in range(max_distance):
+        frontier = {word[:i] + word[i + 1:] for word in frontier for i in range(len(word))} - results
+        results |= frontier
+    return results
+
+def delete_hash(delete: str) -> int:
+    # Stable across processes, unlike hash(); 40 bits leaves 24 for the word position
+    return int.from_bytes(hashlib.blake2b(delete.encode("utf-8"), digest_size=5).digest(), "little")
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    # Optimal string alignment distance (adjacent swaps cost 1); anything
+    # over limit is reported as limit + 1 without finishing the table
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, char_b in enumerate(b, 1):
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                value = min(value, before[j - 2] + 1)
+            current[j] = value
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+def build_index(frequencies: Dict[str, int]) -> bytes:
+    if sys.byteorder != "little":
+        raise RuntimeError("Spell indexes are little-endian")
+    words = sorted(frequencies.items())
+    if len(words) > POSITION_MASK + 1:
+        raise ValueError(f"Spell indexes hold at most {POSITION_MASK + 1} words")
+    offsets, freqs, blob, entries = array("I", [0]), array("I"), bytearray(), array("Q")
+    for position, (word, frequency) in enumerate(words):
+        blob += word.encode("utf-8")
+        offsets.append(len(blob))
+        freqs.append(min(frequency, 0xFFFFFFFF))
+        entries.extend((delete_hash(delete) << POSITION_BITS) | position for delete in deletes(word))
+    entries = array("Q", sorted(entries))
+    header = HEADER.pack(MAGIC, len(words), len(blob), len(entries), MAX_DISTANCE, PREFIX_LENGTH)
+    return header + offsets.tobytes() + freqs.tobytes() + entries.tobytes() + bytes(blob)
+
+class SpellIndex:
+    # Read-only view over a buffer produced by build_index(), usually an mmap
+    def __init__(self, buffer):
+        view = memoryview(buffer)
+        magic, self.count, blob_length, entry_count, self.max_distance, self.prefix_length = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError("Not a spell index")
+        position = HEADER.size
+        self.offsets = view[position:position + 4 * (self.count + 1)].cast("I")
+        position += 4 * (self.count + 1)
+        self.freqs = view[position:position + 4 * self.count].cast("I")
+        position += 4 * self.count
+        self.entries = view[position:position + 8 * entry_count].cast("Q")
+        position += 8 * entry_count
+        self.blob = view[position:position + blob_length]
+
+    @classmethod
+    def open(cls, path: str) -> "SpellIndex":
+        # A compiled index is mapped; a plain word list is compiled in memory
+        with open(path, "rb") as index_file:
+            if index_file.read(len(MAGIC)) == MAGIC:
+                return cls(mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ))
+        return cls(build_index(read_word_list(path)))
+
+    def __len__(self):
+        return self.count
+
+    def word(self, position: int) -> str:
+        return self.blob[self.offsets[position]:self.offsets[position + 1]].tobytes().decode("utf-8")
+
+    def __contains__(self, word: str) -> bool:
+        # Words are stored sorted, so membership is a binary search
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.word(middle) < word:
+                low = middle + 1
+            else:
+                high = middle
+        return low < self.count and self.word(low) == word
+
+    def lookup(self, query: str, max_distance: int) -> List[Tuple[str, int, int]]:
+        # (word, distance, frequency) for every word within max_distance
+        max_distance = min(max_distance, self.max_distance)
+        seen, results = set(), []
+        for delete in deletes(query, max_distance, self.prefix_length):
+            low = delete_hash(delete) << POSITION_BITS
+            start = bisect.bisect_left(self.entries, low)
+            end = bisect.bisect_left(self.entries, low + POSITION_MASK + 1, start)
+            for index in range(start, end):
+                position = self.entries[index] & POSITION_MASK
+                if position in seen:
+                    continue
+                word = self.word(position)
+                if min(len(word), self.prefix_length) - len(delete) > max_distance:
+                    # Reached through more deletes than allowed (or a hash
+                    # collision); if the word is close, a shallower delete finds it
+                    continue
+                seen.add(position)
+                distance = edit_distance(query, word, max_distance)
+                if distance <= max_distance:
+                    results.append((word, distance, self.freqs[position]))
+        return results
+
+class TermSpellIndex:
+    # In-memory delete map over post terms, counted per post. At most
+    # max_terms distinct terms are indexed; past that, new terms are skipped
+    # until removals free room. Terms the word list already knows are
+    # skipped too, since the static index finds them.
+    def __init__(self, max_terms: int, known: Optional[SpellIndex] = None):
+        self.max_terms = max_terms
+        self.known = known
+        self.counts = {}  # term -> posts containing it
+        self.terms_by_delete = {}  # delete -> set of terms
+
+    def add(self, text: str):
+        for term in set(tokenize(text)):
+            if term in self.counts:
+                self.counts[term] += 1
+            elif len(self.counts) < self.max_terms and not self._known(term):
+                self.counts[term] = 1
+                for delete in deletes(term):
+                    self.terms_by_delete.setdefault(delete, set()).add(term)
+
+    def remove(self, text: str):
+        for term in set(tokenize(text)):
+            count = self.counts.get(term)
+            if count is None:
+                continue
+            if count > 1:
+                self.counts[term] = count - 1
+                continue
+            del self.counts[term]
+            for delete in deletes(term):
+                terms = self.terms_by_delete.get(delete)
+                if terms is not None:
+                    terms.discard(term)
+                    if not terms:
+                        del self.terms_by_delete[delete]
+
+    def lookup(self, query: str, max_distance: int) -> List[Tuple[str, int, int]]:
+        max_distance = min(max_distance, MAX_DISTANCE)
+        candidates = set()
+        for delete in deletes(query, max_distance):
+            candidates |= self.terms_by_delete.get(delete, set())
+        results = []
+        for term in candidates:
+            distance = edit_distance(query, term, max_distance)
+            if distance <= max_distance:
+                results.append((term, distance, self.counts[term]))
+        return results
+
+    def _known(self, term: str) -> bool:
+        return self.known is not None and term in self.known
+
+def length_limit(query: str) -> int:
+    # Short words get fewer edits, the same rule as Elasticsearch's fuzziness
+    # AUTO: two edits turn a three-letter word into thousands of others
+    return 0 if len(query) <= 2 else 1 if len(query) <= 5 else 2
+
+def spell(query: str, max_distance: int, limit: int, words: Optional[SpellIndex], terms: TermSpellIndex) -> List[dict]:
+    # Closest first, then most frequent
+    query = query.strip().lower()
+    if not query:
+        return []
+    max_distance = min(max_distance, length_limit(query))
+    found = {}
+    for source in (words, terms):
+        if source is None:
+            continue
+        for word, distance, frequency in source.lookup(query, max_distance):
+            if word in found:
+                found[word] = (distance, found[word][1] + frequency)
+            else:
+                found[word] = (distance, frequency)
+    ranked = sorted(found.items(), key=lambda item: (item[1][0], -item[1][1], item[0]))[:limit]
+    return [{"word": word, "distance": distance, "frequency": frequency} for word, (distance, frequency) in ranked]
+
+def main(argv: Iterable[str]):
+    argv = list(argv)
+    if len(argv) != 3 or argv[0] != "build":
+        sys.exit("usage: python spell.py build <word list> <index file>")
+    frequencies = read_word_list(argv[1])
+    with open(argv[2], "wb") as index_file:
+        index_file.write(build_index(frequencies))
+    print(f"Indexed {len(frequencies)} words into {argv[2]}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
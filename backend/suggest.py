@@ -0,0 +1,265 @@
+"""Prefix autocomplete over a dictionary word list and post title terms.
+
+The word list is static and large, so it is compiled once into a flat binary
+index that can be memory-mapped: the words sorted by UTF-8 bytes (every trie
+node is then a contiguous range of them) plus a segment tree over their
+frequencies, so the top-k words under a prefix come out of a binary search
+and k range-max lookups without touching the rest of the range. Post title
+terms change with every write and live in a small mutable trie instead.
+
+Word list files hold one word per line, optionally followed by a tab and a
+frequency. Compile one with:
+
+    cd backend
+    python suggest.py build words.txt words.idx
+"""
+import heapq
+import mmap
+import re
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MAGIC = b"SUGGEST1"
+HEADER = struct.Struct("<8sIII")  # magic, word count, tree leaf count, blob length
+NO_WORD = 0xFFFFFFFF
+TOKEN_RE = re.compile(r"[^\W_]+")
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+def read_word_list(path: str) -> Dict[str, int]:
+    frequencies = {}
+    with open(path, encoding="utf-8") as lines:
+        for line in lines:
+            word, _, frequency = line.rstrip("\n").partition("\t")
+            word = word.strip().lower()
+            if word:
+                frequencies[word] = frequencies.get(word, 0) + (int(frequency) if frequency.strip() else 1)
+    return frequencies
+
+def build_index(frequencies: Dict[str, int]) -> bytes:
+    if sys.byteorder != "little":
+        raise RuntimeError("Suggest indexes are little-endian")
+    words = sorted((word.encode("utf-8"), min(frequency, NO_WORD - 1)) for word, frequency in frequencies.items())
+    count = len(words)
+    size = 1
+    while size < count:
+        size *= 2
+
+    offsets, freqs, blob = array("I", [0]), array("I"), bytearray()
+    for word, frequency in words:
+        blob += word
+        offsets.append(len(blob))
+        freqs.append(frequency)
+
+    # tree[size + i] is word i; each parent holds the index of its most frequent leaf
+    tree = array("I", [NO_WORD]) * (2 * size)
+    tree[size:size + count] = array("I", range(count))
+    for node in range(size - 1, 0, -1):
+        left, right = tree[2 * node], tree[2 * node + 1]
+        if right == NO_WORD or (left != NO_WORD and freqs[left] >= freqs[right]):
+            tree[node] = left
+        else:
+            tree[node] = right
+    return HEADER.pack(MAGIC, count, size, len(blob)) + offsets.tobytes() + freqs.tobytes() + tree.tobytes() + bytes(blob)
+
+class WordIndex:
+    # Read-only view over a buffer produced by build_index(); nothing is
+    # copied, so with an mmap the pages are loaded only as lookups touch them
+    def __init__(self, buffer):
+        view = memoryview(buffer)
+        magic, self.count, self.size, blob_length = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError("Not a suggest index")
+        position = HEADER.size
+        self.offsets = view[position:position + 4 * (self.count + 1)].cast("I")
+        position += 4 * (self.count + 1)
+        self.freqs = view[position:position + 4 * self.count].cast("I")
+        position += 4 * self.count
+        self.tree = view[position:position + 8 * self.size].cast("I")
+        position += 8 * self.size
+        self.blob = view[position:position + blob_length]
+
+    @classmethod
+    def open(cls, path: str) -> "WordIndex":
+        # A compiled index is mapped; a plain word list is compiled in memory
+        with open(path, "rb") as index_file:
+            if index_file.read(len(MAGIC)) == MAGIC:
+                return cls(mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ))
+        return cls(build_index(read_word_list(path)))
+
+    def __len__(self):
+        return self.count
+
+    def word(self, index: int) -> bytes:
+        return self.blob[self.offsets[index]:self.offsets[index + 1]].tobytes()
+
+    def frequency(self, word: str) -> int:
+        encoded = word.encode("utf-8")
+        index = self._lower_bound(encoded)
+        return self.freqs[index] if index < self.count and self.word(index) == encoded else 0
+
+    def top(self, prefix: str, limit: int) -> List[Tuple[str, int]]:
+        encoded = prefix.encode("utf-8")
+        low = self._lower_bound(encoded)
+        high = self._prefix_end(encoded, low)
+        results, candidates = [], []
+        self._push(candidates, low, high)
+        while candidates and len(results) < limit:
+            _, index, start, end = heapq.heappop(candidates)
+            results.append((self.word(index).decode("utf-8"), self.freqs[index]))
+            self._push(candidates, start, index)
+            self._push(candidates, index + 1, end)
+        return results
+
+    def _push(self, candidates: list, start: int, end: int):
+        if start < end:
+            index = self._argmax(start, end)
+            heapq.heappush(candidates, (-self.freqs[index], index, start, end))
+
+    def _argmax(self, start: int, end: int) -> int:
+        # Most frequent word in [start, end); ties go to the alphabetically first
+        tree, freqs = self.tree, self.freqs
+        best, best_freq = NO_WORD, -1
+        start += self.size
+        end += self.size
+        while start < end:
+            if start & 1:
+                index = tree[start]
+                if freqs[index] > best_freq or (freqs[index] == best_freq and index < best):
+                    best, best_freq = index, freqs[index]
+                start += 1
+            if end & 1:
+                end -= 1
+                index = tree[end]
+                if freqs[index] > best_freq or (freqs[index] == best_freq and index < best):
+                    best, best_freq = index, freqs[index]
+            start >>= 1
+            end >>= 1
+        return best
+
+    def _lower_bound(self, key: bytes) -> int:
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.word(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _prefix_end(self, prefix: bytes, low: int) -> int:
+        high = self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.word(middle)[:len(prefix)] <= prefix:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+class TrieNode:
+    __slots__ = ("children", "count", "top")
+
+    def __init__(self):
+        self.children = {}
+        self.count = 0  # posts whose title contains the term ending here
+        self.top = []  # up to k (term, count), most frequent first
+
+class TermTrie:
+    # Mutable trie over post title terms. Each node caches the top k terms
+    # below it, so a lookup is one walk down the prefix; an increment only
+    # re-ranks the cached lists on its path, a decrement rebuilds them.
+    def __init__(self, k: int = 20):
+        self.k = k
+        self.root = TrieNode()
+
+    def add(self, text: str):
+        for term in set(tokenize(text)):
+            self._change(term, 1)
+
+    def remove(self, text: str):
+        for term in set(tokenize(text)):
+            self._change(term, -1)
+
+    def top(self, prefix: str, limit: int) -> List[Tuple[str, int]]:
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return node.top[:limit]
+
+    def count(self, term: str) -> int:
+        node = self.root
+        for char in term:
+            node = node.children.get(char)
+            if node is None:
+                return 0
+        return node.count
+
+    def _change(self, term: str, delta: int):
+        path = [self.root]
+        for char in term:
+            node = path[-1].children.get(char)
+            if node is None:
+                if delta < 0:
+                    return
+                node = path[-1].children[char] = TrieNode()
+            path.append(node)
+        leaf = path[-1]
+        leaf.count = max(leaf.count + delta, 0)
+        if delta > 0:
+            for node in path:
+                self._promote(node, term, leaf.count)
+            return
+        # Walking back up, prune emptied nodes and rebuild each cached list
+        for depth in range(len(path) - 1, -1, -1):
+            node = path[depth]
+            if depth and node.count == 0 and not node.children:
+                del path[depth - 1].children[term[depth - 1]]
+                continue
+            candidates = [(term_at, count) for child in node.children.values() for term_at, count in child.top]
+            if node.count:
+                candidates.append((term[:depth], node.count))
+            node.top = heapq.nsmallest(self.k, candidates, key=lambda item: (-item[1], item[0]))
+
+    def _promote(self, node: TrieNode, term: str, count: int):
+        top = [item for item in node.top if item[0] != term]
+        top.append((term, count))
+        top.sort(key=lambda item: (-item[1], item[0]))
+        node.top = top[:self.k]
+
+def suggest(prefix: str, limit: int, words: Optional[WordIndex], titles: TermTrie) -> List[dict]:
+    # Candidates are the top `limit` of each source, each ranked by its
+    # combined frequency across both
+    prefix = prefix.strip().lower()
+    if not prefix:
+        return []
+    word_top = dict(words.top(prefix, limit)) if words is not None else {}
+    title_top = dict(titles.top(prefix, limit))
+    scores = {}
+    for term in word_top.keys() | title_top.keys():
+        word_frequency = word_top.get(term)
+        if word_frequency is None:
+            word_frequency = words.frequency(term) if words is not None else 0
+        title_frequency = title_top.get(term)
+        if title_frequency is None:
+            title_frequency = titles.count(term)
+        scores[term] = word_frequency + title_frequency
+    ranked = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+    return [{"word": word, "frequency": frequency} for word, frequency in ranked]
+
+def main(argv: Iterable[str]):
+    argv = list(argv)
+    if len(argv) != 3 or argv[0] != "build":
+        sys.exit("usage: python suggest.py build <word list> <index file>")
+    frequencies = read_word_list(argv[1])
+    with open(argv[2], "wb") as index_file:
+        index_file.write(build_index(frequencies))
+    print(f"Indexed {len(frequencies)} words into {argv[2]}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
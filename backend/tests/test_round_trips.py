@@ -0,0 +1,111 @@
+"""Mongo round trips per post write, counted with pymongo command monitoring.
+
+Points the app in main.py at a scratch database on MONGODB_URL, registers a
+CommandListener on a fresh Motor client and counts the commands each request
+sends once the auth cache is warm. Updating your own post should take one
+round trip (it used to take three); creating or deleting one takes the write
+plus one bulk write each to the category counters and the author's
+post_count. Only the 403/404 paths pay for a follow-up lookup. A batch
+delete takes the same number of round trips whatever its size. Skipped
+when MONGODB_URL is not set.
+
+    cd backend
+    MONGODB_URL=mongodb://localhost:27017 python -m unittest tests.test_round_trips
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# The batch test creates more posts than the per-user write limit allows in a minute
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import httpx
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+import main
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        self.commands.append(event.command_name)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+@unittest.skipUnless(os.getenv("MONGODB_URL"), "needs a MongoDB server at MONGODB_URL")
+class RoundTripTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.counter = CommandCounter()
+        self.client = AsyncIOMotorClient(main.MONGODB_URL, event_listeners=[self.counter])
+        self.database = self.client[f"{main.DATABASE_NAME}_round_trips"]
+        await self.client.drop_database(self.database.name)
+        main.database = self.database
+        main.users_collection = self.database.users
+        main.posts_collection = self.database.posts
+        main.categories_collection = self.database.categories
+        await main.ensure_indexes()
+
+        self.http = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test")
+        self.headers = {}
+        for username in ("alice", "mallory"):
+            response = await self.http.post("/auth/signup", json={
+                "username": username, "email": f"{username}@example.com", "password": "secret"})
+            self.headers[username] = {"Authorization": f"Bearer {response.json()['access_token']}"}
+            await self.http.get("/auth/me", headers=self.headers[username])  # warm the user cache
+
+    async def asyncTearDown(self):
+        await self.http.aclose()
+        await self.client.drop_database(self.database.name)
+        self.client.close()
+
+    async def request(self, method, path, user, body, expected_status, budget):
+        # Sends one request and checks its status and the commands it sent
+        self.counter.commands.clear()
+        response = await self.http.request(method, path, json=body, headers=self.headers[user])
+        commands = list(self.counter.commands)
+        self.assertEqual(response.status_code, expected_status, commands)
+        self.assertLessEqual(len(commands), budget, commands)
+        return response
+
+    async def test_single_post_writes(self):
+        response = await self.request("POST", "/posts", "alice", {"title": "t", "content": "c"}, 200, 3)
+        post_id = response.json()["_id"]
+        missing_id = "0" * 24
+
+        # (label, method, path, user, body, expected status, round-trip budget)
+        cases = [
+            ("update own post", "PUT", f"/posts/{post_id}", "alice", {"title": "u"}, 200, 1),
+            ("update other's post", "PUT", f"/posts/{post_id}", "mallory", {"title": "x"}, 403, 2),
+            ("update missing post", "PUT", f"/posts/{missing_id}", "alice", {"title": "x"}, 404, 2),
+            ("delete other's post", "DELETE", f"/posts/{post_id}", "mallory", None, 403, 2),
+            ("delete own post", "DELETE", f"/posts/{post_id}", "alice", None, 200, 3),
+            ("delete missing post", "DELETE", f"/posts/{missing_id}", "alice", None, 404, 2),
+        ]
+        for label, method, path, user, body, expected_status, budget in cases:
+            with self.subTest(label):
+                await self.request(method, path, user, body, expected_status, budget)
+
+    async def test_batch_delete(self):
+        # Authorship check, mark, read back, delete, then the two counter bulk writes
+        for size in (2, 20):
+            post_ids = []
+            for i in range(size):
+                response = await self.http.post("/posts", json={
+                    "title": f"Post {i}", "content": "c", "category": f"category-{i % 3}"}, headers=self.headers["alice"])
+                post_ids.append(response.json()["_id"])
+            with self.subTest(size=size):
+                response = await self.request("DELETE", "/posts/batch", "alice", post_ids, 200, 6)
+                self.assertEqual([item["status"] for item in response.json()], [200] * size)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,282 @@
+"""Append-only write-ahead log with group-committed fsyncs and snapshots.
+
+Records are dicts, encoded with orjson and framed as (length, crc32,
+payload), so a write torn by a crash is detected on replay and cut off.
+Appends only buffer the encoded bytes; a background task writes and fsyncs
+everything buffered once per interval, and sync() waits for the fsync that
+covers the caller's records, so concurrent writers share one fsync.
+
+The log is split into generations. A snapshot is a compact log of the
+whole state (the records that rebuild it) and starts a new generation:
+snapshot.N holds everything before wal.N. On boot, replay() reads the
+newest complete snapshot and every log from its generation on, then the
+older files are deleted once the next snapshot is durable.
+
+    data/snapshot.00000003
+    data/wal.00000003
+"""
+import asyncio
+import logging
+import os
+import struct
+import zlib
+from typing import Callable, Iterable, Iterator, List
+
+import orjson
+
+FRAME = struct.Struct("<II")  # payload length, crc32 of payload
+SNAPSHOT_PREFIX = "snapshot."
+LOG_PREFIX = "wal."
+
+logger = logging.getLogger(__name__)
+
+def encode(record: dict) -> bytes:
+    payload = orjson.dumps(record)
+    return FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+def read_records(path: str) -> Iterator[dict]:
+    # Stops at the first incomplete or corrupt frame; valid_length() reports where
+    with open(path, "rb") as log_file:
+        data = log_file.read()
+    for _, record in _frames(data):
+        yield orjson.loads(record)
+
+def valid_length(path: str) -> int:
+    with open(path, "rb") as log_file:
+        data = log_file.read()
+    end = 0
+    for end, _ in _frames(data):
+        pass
+    return end
+
+def _frames(data: bytes):
+    position = 0
+    while position + FRAME.size <= len(data):
+        length, checksum = FRAME.unpack_from(data, position)
+        start = position + FRAME.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            return
+        position = start + length
+        yield position, payload
+
+def _generations(directory: str, prefix: str) -> List[int]:
+    return sorted(int(name[len(prefix):]) for name in os.listdir(directory)
+                  if name.startswith(prefix) and name[len(prefix):].isdigit())
+
+def _fsync_directory(directory: str):
+    # Makes file creations and renames in the directory durable
+    descriptor = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+class WriteAheadLog:
+    def __init__(self, directory: str, fsync_interval: float, snapshot_records: int,
+                 snapshot_source: Callable[[], Iterable[dict]]):
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self.snapshot_records = snapshot_records  # log records between snapshots
+        self.snapshot_source = snapshot_source  # records that rebuild the current state
+        self.generation = 0
+        self.records_since_snapshot = 0
+        self.pending = bytearray()
+        self.appended = 0  # records appended so far
+        self.durable = 0  # of those, records fsynced
+        self.waiters = []  # (records, future) resolved once that many are durable
+        self.log_fd = None
+        self.lock = None
+        self.dirty = None
+        self.closing = False
+        self.task = None
+        self.snapshot_task = None
+        self.fsyncs = 0
+        self.snapshots = 0
+
+    def replay(self) -> Iterator[dict]:
+        # The newest snapshot, then every log from its generation on. A torn
+        # tail on the last log is truncated so appends continue after the
+        # last whole record.
+        os.makedirs(self.directory, exist_ok=True)
+        snapshots = _generations(self.directory, SNAPSHOT_PREFIX)
+        self.generation = snapshots[-1] if snapshots else 0
+        if snapshots:
+            yield from read_records(self._path(SNAPSHOT_PREFIX, self.generation))
+        logs = [generation for generation in _generations(self.directory, LOG_PREFIX) if generation >= self.generation]
+        for generation in logs:
+            path = self._path(LOG_PREFIX, generation)
+            for record in read_records(path):
+                self.records_since_snapshot += 1
+                yield record
+            length = valid_length(path)
+            if length < os.path.getsize(path):
+                logger.warning("Truncating %s at byte %d: incomplete or corrupt record", path, length)
+                os.truncate(path, length)
+        if logs:
+            self.generation = logs[-1]
+
+    def start(self):
+        # Call after replay(), from the event loop
+        self.log_fd = self._open_log(self.generation)
+        self.lock = asyncio.Lock()
+        self.dirty = asyncio.Event()
+        self.task = asyncio.create_task(self._run())
+
+    def append(self, record: dict):
+        # Encoded now, since callers go on mutating the dicts they log
+        self.pending += encode(record)
+        self.appended += 1
+        self.records_since_snapshot += 1
+        if self.dirty is not None:
+            self.dirty.set()
+
+    async def sync(self):
+        # Returns once everything appended so far is on disk
+        if self.durable >= self.appended:
+            return
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.append((self.appended, future))
+        self.dirty.set()
+        await future
+
+    async def snapshot(self):
+        async with self.lock:
+            # One synchronous step: the records taken here reflect everything
+            # appended so far, those appends still pending go to the old
+            # generation's log, and later ones to the new log. Replay reads
+            # either the old logs or the new snapshot, never both, so nothing
+            # is applied twice.
+            records = list(self.snapshot_source())
+            data, appended = bytes(self.pending), self.appended
+            self.pending = bytearray()
+            previous, old_fd = self.generation, self.log_fd
+            self.generation += 1
+            self.log_fd = self._open_log(self.generation)
+            self.records_since_snapshot = 0
+            try:
+                await self._commit(old_fd, data, appended)
+            finally:
+                os.close(old_fd)
+        # Encoding happens off the loop too. Records hold the live documents,
+        # so a later write may already show in the snapshot; replaying that
+        # write's record on top of it gives the same state.
+        await asyncio.to_thread(self._write_snapshot, self.generation, records, previous)
+        self.snapshots += 1
+
+    async def close(self):
+        # Flushes what is buffered and leaves a snapshot so the next boot replays little
+        if self.task is None:
+            return
+        self.closing = True
+        self.dirty.set()
+        await self.task
+        self.task = None
+        if self.snapshot_task is not None:
+            await asyncio.gather(self.snapshot_task, return_exceptions=True)
+        if self.records_since_snapshot:
+            await self.snapshot()
+        async with self.lock:
+            await self._flush()
+            os.close(self.log_fd)
+
+    async def _run(self):
+        while not self.closing:
+            await self.dirty.wait()
+            if not self.closing:
+                # Let more writes join this fsync
+                await asyncio.sleep(self.fsync_interval)
+            self.dirty.clear()
+            try:
+                async with self.lock:
+                    await self._flush()
+            except OSError:
+                logger.exception("Write-ahead log flush failed; its records are retried with the next one")
+                continue
+            if self.records_since_snapshot >= self.snapshot_records and (
+                    self.snapshot_task is None or self.snapshot_task.done()):
+                # Separate task, so fsyncs carry on while the snapshot is written
+                self.snapshot_task = asyncio.create_task(self._background_snapshot())
+
+    async def _background_snapshot(self):
+        try:
+            await self.snapshot()
+        except OSError:
+            logger.exception("Write-ahead log snapshot failed; the log is kept until the next one")
+
+    async def _flush(self):
+        # Caller holds the lock
+        data, appended = bytes(self.pending), self.appended
+        self.pending = bytearray()
+        await self._commit(self.log_fd, data, appended)
+
+    async def _commit(self, log_fd: int, data: bytes, appended: int):
+        # Writes the records up to `appended` and resolves their waiters. On
+        # failure the bytes go back on the queue for the next flush (to the
+        # current log) and the writers waiting on them get the error.
+        if data:
+            try:
+                await asyncio.to_thread(self._write, log_fd, data)
+            except OSError as exc:
+                self.pending[:0] = data
+                self.dirty.set()
+                for target, waiter in self.waiters:
+                    if target <= appended and not waiter.done():
+                        waiter.set_exception(exc)
+                self.waiters = [(target, waiter) for target, waiter in self.waiters if not waiter.done()]
+                raise
+            self.durable = appended
+            self.fsyncs += 1
+        waiting = []
+        for target, waiter in self.waiters:
+            if target > self.durable:
+                waiting.append((target, waiter))
+            elif not waiter.done():
+                waiter.set_result(None)
+        self.waiters = waiting
+
+    def render(self) -> str:
+        return (
+            "# TYPE wal_records_total counter\n"
+            f"wal_records_total {self.appended}\n"
+            "# TYPE wal_fsyncs_total counter\n"
+            f"wal_fsyncs_total {self.fsyncs}\n"
+            "# TYPE wal_snapshots_total counter\n"
+            f"wal_snapshots_total {self.snapshots}\n"
+            "# TYPE wal_generation gauge\n"
+            f"wal_generation {self.generation}\n"
+        )
+
+    def _open_log(self, generation: int) -> int:
+        return os.open(self._path(LOG_PREFIX, generation), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    @staticmethod
+    def _write(log_fd: int, data: bytes):
+        offset = os.lseek(log_fd, 0, os.SEEK_END)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(log_fd, view):]
+            os.fsync(log_fd)
+        except OSError:
+            # Drop a partial write so the retry doesn't leave a torn record mid-log
+            os.ftruncate(log_fd, offset)
+            raise
+
+    def _write_snapshot(self, generation: int, records: List[dict], previous: int):
+        path = self._path(SNAPSHOT_PREFIX, generation)
+        with open(path + ".tmp", "wb") as snapshot_file:
+            for record in records:
+                snapshot_file.write(encode(record))
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(path + ".tmp", path)
+        _fsync_directory(self.directory)
+        # Only now is everything up to the new generation durable without the old files
+        for prefix in (SNAPSHOT_PREFIX, LOG_PREFIX):
+            for old in _generations(self.directory, prefix):
+                if old <= previous:
+                    os.remove(self._path(prefix, old))
+
+    def _path(self, prefix: str, generation: int) -> str:
+        return os.path.join(self.directory, f"{prefix}{generation:08d}")
@@ -45,6 +45,41 @@ const Dashboard = () => {
     fetchPosts();
   }, []);
 
+  // Apply post changes pushed by GET /posts/stream instead of refetching;
+  // "reset" means events were missed, so reload once and reconnect
+  useEffect(() => {
+    if (!user) {
+      return undefined;
+    }
+    const postId = (post) => post.id ?? post._id;
+    let source;
+    const connect = () => {
+      source = new EventSource(`${import.meta.env.VITE_API_URL || 'http://localhost:8000'}/posts/stream`);
+      source.addEventListener('created', (event) => {
+        const post = JSON.parse(event.data);
+        if (post.author_username !== user.username) {
+          return;
+        }
+        setPosts((current) => current.some((item) => postId(item) === postId(post)) ? current : [post, ...current]);
+      });
+      source.addEventListener('updated', (event) => {
+        const post = JSON.parse(event.data);
+        setPosts((current) => current.map((item) => postId(item) === postId(post) ? post : item));
+      });
+      source.addEventListener('deleted', (event) => {
+        const deletedId = postId(JSON.parse(event.data));
+        setPosts((current) => current.filter((item) => postId(item) !== deletedId));
+      });
+      source.addEventListener('reset', () => {
+        source.close();
+        fetchPosts();
+        connect();
+      });
+    };
+    connect();
+    return () => source.close();
+  }, [user?.username]);
+
   const fetchPosts = async () => {
     try {
       setLoading(true);